@@ -0,0 +1,526 @@
+import csv
+import json
+import random
+import re
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .urls import router
+from food.models import (TAG_BITS, Favorite, Ingredient, IngredientsRecipes,
+                         Recipe, ShoppingCart, Tag)
+from food.counters import reconcile_counters
+from food.search import update_search_vectors
+from food.tags import update_tags_mask
+from food.utils import rebuild_shopping_lists
+from user.models import Subscriptions
+
+User = get_user_model()
+
+BENCHMARK_PASSWORD: str = 'Benchmark-Pa55word'
+BENCHMARK_IMAGE: str = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC'
+    '0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+)
+# Маршруты djoser для управления учётной записью: отправляют письма
+# или меняют учётные данные, в замеры не входят.
+SKIPPED_ROUTES: frozenset = frozenset((
+    'cookuser-activation',
+    'cookuser-resend-activation',
+    'cookuser-reset-password',
+    'cookuser-reset-password-confirm',
+    'cookuser-reset-username',
+    'cookuser-reset-username-confirm',
+    'cookuser-set-password',
+    'cookuser-set-username',
+))
+# Списочные маршруты, число запросов которых не должно зависеть от limit
+SCALING_ROUTES: tuple[tuple[str, str], ...] = (
+    ('recipes', '/api/recipes/?limit={limit}'),
+    ('recipes_by_tags', '/api/recipes/?limit={limit}&tags={tag}'),
+    ('recipes_favorited', '/api/recipes/?limit={limit}&is_favorited=1'),
+    ('recipes_in_cart', '/api/recipes/?limit={limit}&is_in_shopping_cart=1'),
+    ('recipes_search', '/api/recipes/?limit={limit}&search=рецепт'),
+    ('users', '/api/users/?limit={limit}'),
+    ('subscriptions',
+     '/api/users/subscriptions/?limit={limit}&recipes_limit=3'),
+)
+EXPLAIN_SQL: dict[str, str] = {
+    'postgresql': 'EXPLAIN ANALYZE {}',
+    'sqlite': 'EXPLAIN QUERY PLAN {}',
+}
+# Строки плана с полным чтением таблицы, без индекса
+SEQ_SCAN_PATTERNS: dict[str, re.Pattern] = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'^SCAN (\w+)(?: AS \w+)?$'),
+}
+
+
+def benchmark_settings() -> dict[str, Any]:
+    """
+    Настройки прогона. Изображения не обрабатываются в фоне, чтобы потоки
+    не писали в базу во время наполнения и замеров. Кэш остаётся
+    настроенным, чтобы замеры включали его запросы, но ключи прогона
+    получают свой префикс и не смешиваются с рабочими
+    """
+    prefix = f'benchmark-{time.time_ns()}'
+    return {
+        'IMAGE_TASK_BACKEND': 'food.tasks.DisabledBackend',
+        'CACHES': {
+            alias: {**config, 'KEY_PREFIX': prefix}
+            for alias, config in settings.CACHES.items()
+        },
+    }
+
+
+def read_ingredients(path: Path) -> list[dict]:
+    """Прочитать каталог ингредиентов из csv"""
+    with open(path, encoding='utf-8', newline='') as file:
+        return [
+            {
+                'name': row['name'],
+                'measurement_unit': row['measurement_unit'],
+            }
+            for row in csv.DictReader(file)
+        ]
+
+
+def add_dataset_arguments(parser) -> None:
+    """Параметры синтетических данных для команд замеров"""
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--recipes', type=int, default=300)
+    parser.add_argument(
+        '--tags', type=int, default=8, choices=range(2, TAG_BITS + 1),
+        metavar=f'2..{TAG_BITS}')
+    parser.add_argument(
+        '--favorites', type=int, default=20,
+        help='Избранных рецептов на пользователя')
+    parser.add_argument(
+        '--carts', type=int, default=10,
+        help='Рецептов в корзине на пользователя')
+    parser.add_argument(
+        '--subscriptions', type=int, default=10,
+        help='Подписок на пользователя')
+    parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+    parser.add_argument(
+        '--ingredients-file', type=Path,
+        default=default_ingredients_file())
+
+
+def seed_from_options(options: dict) -> dict[str, Any]:
+    """Наполнить базу по параметрам add_dataset_arguments"""
+    return seed_dataset(
+        users=options['users'],
+        recipes=options['recipes'],
+        tags=options['tags'],
+        favorites=options['favorites'],
+        carts=options['carts'],
+        subscriptions=options['subscriptions'],
+        ingredients_per_recipe=options['ingredients_per_recipe'],
+        ingredients_file=options['ingredients_file'],
+    )
+
+
+def seed_dataset(
+    users: int,
+    recipes: int,
+    tags: int,
+    favorites: int,
+    carts: int,
+    subscriptions: int,
+    ingredients_per_recipe: int,
+    ingredients_file: Path,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """
+    Наполнить базу синтетическими данными заданного масштаба.
+    favorites, carts и subscriptions задаются на одного пользователя.
+    """
+    rnd = random.Random(seed)
+    Ingredient.objects.bulk_create(
+        [Ingredient(**row) for row in read_ingredients(ingredients_file)],
+        ignore_conflicts=True,
+    )
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tag_objs = Tag.objects.bulk_create([
+        Tag(name=f'Тег {num}', color=f'#{num:06X}', slug=f'tag_{num}',
+            bit=num)
+        for num in range(tags)
+    ])
+    password = make_password(BENCHMARK_PASSWORD)
+    user_objs = User.objects.bulk_create([
+        User(
+            username=f'bench_{num}',
+            email=f'bench_{num}@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+            password=password,
+        )
+        for num in range(users)
+    ])
+    recipe_objs = Recipe.objects.bulk_create([
+        Recipe(
+            author=rnd.choice(user_objs),
+            name=f'Рецепт {num}',
+            image='food_images/benchmark.png',
+            text='Описание рецепта ' * 10,
+            cooking_time=rnd.randint(1, 120),
+        )
+        for num in range(recipes)
+    ])
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipe_objs
+        for tag in rnd.sample(tag_objs, min(len(tag_objs), 2))
+    ])
+    IngredientsRecipes.objects.bulk_create([
+        IngredientsRecipes(
+            recipe=recipe, ingredient_id=ingredient_id,
+            amount=rnd.randint(1, 500),
+        )
+        for recipe in recipe_objs
+        for ingredient_id in rnd.sample(
+            ingredient_ids, min(len(ingredient_ids), ingredients_per_recipe))
+    ])
+    Favorite.objects.bulk_create([
+        Favorite(user=user, recipe=recipe)
+        for user in user_objs
+        for recipe in rnd.sample(recipe_objs, min(recipes, favorites))
+    ])
+    ShoppingCart.objects.bulk_create([
+        ShoppingCart(user=user, recipe=recipe)
+        for user in user_objs
+        for recipe in rnd.sample(recipe_objs, min(recipes, carts))
+    ])
+    Subscriptions.objects.bulk_create([
+        Subscriptions(user=user, subscriber=author)
+        for user in user_objs
+        for author in rnd.sample(
+            [obj for obj in user_objs if obj != user],
+            min(users - 1, subscriptions))
+    ])
+    update_tags_mask(recipe.id for recipe in recipe_objs)
+    reconcile_counters()
+    rebuild_shopping_lists()
+    update_search_vectors()
+    return {
+        'users': user_objs,
+        'recipes': recipe_objs,
+        'tags': tag_objs,
+        'ingredients': ingredient_ids,
+    }
+
+
+def make_client(user: Any = None) -> APIClient:
+    """Получить клиент API, авторизованный токеном user"""
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def recipe_payload(dataset: dict[str, Any], name: str) -> dict[str, Any]:
+    """Тело запроса на создание рецепта"""
+    return {
+        'tags': [tag.id for tag in dataset['tags'][:2]],
+        'ingredients': [
+            {'id': ingredient_id, 'amount': 10}
+            for ingredient_id in dataset['ingredients'][:5]
+        ],
+        'name': name,
+        'image': BENCHMARK_IMAGE,
+        'text': 'Описание рецепта',
+        'cooking_time': 10,
+    }
+
+
+def build_scenarios(dataset: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Сценарии обхода API.
+    Сценарии выполняются по порядку, состояние между ними
+    передаётся через state, так что повторный прогон идемпотентен.
+    """
+    user, author, guest = dataset['users'][:3]
+    recipe = dataset['recipes'][0]
+    tag, other_tag = dataset['tags'][:2]
+    bulk_ids = [obj.id for obj in dataset['recipes'][2:12]]
+    ingredient_id = dataset['ingredients'][0]
+    Favorite.objects.filter(user=user, recipe=recipe).delete()
+    ShoppingCart.objects.filter(user=user, recipe=recipe).delete()
+    Subscriptions.objects.filter(user=user, subscriber=author).delete()
+    return [
+        {'name': 'api_root', 'url': '/api/'},
+        {'name': 'login', 'method': 'post', 'client': 'anonymous',
+         'url': '/api/auth/token/login/',
+         'data': {'email': guest.email, 'password': BENCHMARK_PASSWORD}},
+        {'name': 'logout', 'method': 'post', 'client': 'guest',
+         'url': '/api/auth/token/logout/', 'status': 204},
+        {'name': 'users_list', 'url': '/api/users/'},
+        {'name': 'users_detail', 'url': f'/api/users/{author.id}/'},
+        {'name': 'users_me', 'url': '/api/users/me/'},
+        {'name': 'subscriptions', 'url': '/api/users/subscriptions/'},
+        {'name': 'subscribe', 'method': 'post', 'status': 201,
+         'url': f'/api/users/{author.id}/subscribe/'},
+        {'name': 'unsubscribe', 'method': 'delete', 'status': 204,
+         'url': f'/api/users/{author.id}/subscribe/'},
+        {'name': 'tags_list', 'url': '/api/tags/'},
+        {'name': 'tags_detail', 'url': f'/api/tags/{tag.id}/'},
+        {'name': 'ingredients_list', 'url': '/api/ingredients/'},
+        {'name': 'ingredients_search', 'url': '/api/ingredients/?name=а'},
+        {'name': 'ingredients_detail',
+         'url': f'/api/ingredients/{ingredient_id}/'},
+        {'name': 'recipes_list', 'url': '/api/recipes/'},
+        {'name': 'recipes_list_anonymous', 'url': '/api/recipes/',
+         'client': 'anonymous'},
+        {'name': 'recipes_by_tags',
+         'url': f'/api/recipes/?tags={tag.slug}'},
+        {'name': 'recipes_by_all_tags',
+         'url': f'/api/recipes/?tags={tag.slug}&tags={other_tag.slug}'
+                '&tags_match=all'},
+        {'name': 'recipes_by_author',
+         'url': f'/api/recipes/?author={author.id}'},
+        {'name': 'recipes_search', 'url': '/api/recipes/?search=рецепт'},
+        {'name': 'recipes_detail', 'url': f'/api/recipes/{recipe.id}/'},
+        {'name': 'recipes_create', 'method': 'post', 'status': 201,
+         'url': '/api/recipes/',
+         'data': lambda state: recipe_payload(dataset, 'Новый рецепт'),
+         'save': 'created'},
+        {'name': 'recipes_update', 'method': 'patch',
+         'url': lambda state: f'/api/recipes/{state["created"]}/',
+         'data': lambda state: recipe_payload(dataset, 'Новое название')},
+        {'name': 'recipes_delete', 'method': 'delete', 'status': 204,
+         'url': lambda state: f'/api/recipes/{state["created"]}/'},
+        {'name': 'favorite', 'method': 'post', 'status': 201,
+         'url': f'/api/recipes/{recipe.id}/favorite/'},
+        {'name': 'favorite_delete', 'method': 'delete', 'status': 204,
+         'url': f'/api/recipes/{recipe.id}/favorite/'},
+        {'name': 'shopping_cart', 'method': 'post', 'status': 201,
+         'url': f'/api/recipes/{recipe.id}/shopping_cart/'},
+        {'name': 'shopping_cart_delete', 'method': 'delete', 'status': 204,
+         'url': f'/api/recipes/{recipe.id}/shopping_cart/'},
+        {'name': 'download_shopping_cart',
+         'url': '/api/recipes/download_shopping_cart/'},
+        {'name': 'favorite_bulk', 'method': 'post',
+         'url': '/api/recipes/favorite/', 'data': {'recipes': bulk_ids}},
+        {'name': 'favorite_bulk_delete', 'method': 'delete',
+         'url': '/api/recipes/favorite/', 'data': {'recipes': bulk_ids}},
+        {'name': 'shopping_cart_bulk_delete', 'method': 'delete',
+         'url': '/api/recipes/shopping_cart/',
+         'data': {'recipes': bulk_ids[::2]}},
+        {'name': 'shopping_cart_clear', 'method': 'delete',
+         'url': '/api/recipes/shopping_cart/clear/'},
+        # Корзина снова наполняется для следующего прогона
+        {'name': 'shopping_cart_bulk', 'method': 'post',
+         'url': '/api/recipes/shopping_cart/', 'data': {'recipes': bulk_ids}},
+    ]
+
+
+def _resolve(value: Any, state: dict) -> Any:
+    return value(state) if callable(value) else value
+
+
+def _request(
+    client: APIClient, scenario: dict, state: dict
+) -> tuple[Any, int, float]:
+    """Выполнить запрос сценария, вернуть ответ, число запросов и время"""
+    method = getattr(client, scenario.get('method', 'get'))
+    url = _resolve(scenario['url'], state)
+    data = _resolve(scenario.get('data'), state)
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = method(url, data, format='json')
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+    expected = scenario.get('status', 200)
+    if response.status_code != expected:
+        raise AssertionError(
+            f'{scenario["name"]}: {url} вернул {response.status_code}, '
+            f'ожидался {expected}')
+    if scenario.get('save'):
+        state[scenario['save']] = response.data['id']
+    return response, len(queries.captured_queries), elapsed
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """Перцентиль по выборке значений"""
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1]
+
+
+def run_scenarios(
+    dataset: dict[str, Any],
+    repeat: int,
+    on_response: Callable = None,
+) -> dict[str, dict]:
+    """
+    Прогнать сценарии repeat раз и замерить число запросов,
+    p50/p95 задержки и пиковую память
+    """
+    user, _, guest = dataset['users'][:3]
+    clients = {
+        'user': make_client(user),
+        'guest': make_client(guest),
+        'anonymous': make_client(),
+    }
+    scenarios = build_scenarios(dataset)
+    timings = {scenario['name']: [] for scenario in scenarios}
+    queries = {scenario['name']: 0 for scenario in scenarios}
+    state = {}
+    for _ in range(repeat):
+        for scenario in scenarios:
+            if scenario['name'] == 'logout':
+                clients['guest'] = make_client(guest)
+            client = clients[scenario.get('client', 'user')]
+            response, count, elapsed = _request(client, scenario, state)
+            timings[scenario['name']].append(elapsed)
+            queries[scenario['name']] = max(queries[scenario['name']], count)
+            if on_response is not None:
+                on_response(scenario, response)
+    memory = {}
+    for scenario in scenarios:
+        if scenario['name'] == 'logout':
+            clients['guest'] = make_client(guest)
+        client = clients[scenario.get('client', 'user')]
+        tracemalloc.start()
+        _request(client, scenario, state)
+        memory[scenario['name']] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        scenario['name']: {
+            'url': scenario['url'] if isinstance(scenario['url'], str)
+            else _resolve(scenario['url'], {'created': '{id}'}),
+            'method': scenario.get('method', 'get').upper(),
+            'queries': queries[scenario['name']],
+            'p50_ms': round(percentile(timings[scenario['name']], 50) * 1000,
+                            3),
+            'p95_ms': round(percentile(timings[scenario['name']], 95) * 1000,
+                            3),
+            'peak_memory_kb': round(memory[scenario['name']] / 1024, 1),
+        }
+        for scenario in scenarios
+    }
+
+
+def uncovered_routes(dataset: dict[str, Any]) -> list[str]:
+    """Маршруты api/urls.py, не покрытые сценариями"""
+    covered = {
+        resolve(_resolve(scenario['url'], {'created': 1}).split('?')[0]
+                ).url_name
+        for scenario in build_scenarios(dataset)
+    }
+    routes = {url.name for url in router.urls} | {'login', 'logout'}
+    return sorted(routes - covered - SKIPPED_ROUTES)
+
+
+def check_scaling(
+    dataset: dict[str, Any], small_limit: int, large_limit: int
+) -> dict[str, dict]:
+    """Сравнить число запросов списочных маршрутов при разном limit"""
+    client = make_client(dataset['users'][0])
+    tag = dataset['tags'][0].slug
+    result = {}
+    for name, url in SCALING_ROUTES:
+        counts = {}
+        for limit in (small_limit, large_limit):
+            scenario = {'name': name, 'url': url.format(limit=limit, tag=tag)}
+            _, counts[limit], _ = _request(client, scenario, {})
+        result[name] = {
+            'small': counts[small_limit],
+            'large': counts[large_limit],
+            'grows': counts[large_limit] > counts[small_limit],
+        }
+    return result
+
+
+def explain(sql: str) -> list[str]:
+    """План запроса построчно"""
+    with connection.cursor() as cursor:
+        cursor.execute(EXPLAIN_SQL[connection.vendor].format(sql))
+        rows = cursor.fetchall()
+    # В EXPLAIN QUERY PLAN SQLite описание шага в последней колонке
+    return [row[-1] for row in rows]
+
+
+def seq_scans(plan: list[str]) -> list[str]:
+    """Таблицы, которые план читает целиком"""
+    pattern = SEQ_SCAN_PATTERNS[connection.vendor]
+    tables = set(connection.introspection.table_names())
+    return [
+        match.group(1)
+        for match in map(pattern.search, plan)
+        if match and match.group(1) in tables
+    ]
+
+
+def explain_scenarios(
+    dataset: dict[str, Any], ignore_tables: frozenset = frozenset()
+) -> dict[str, list[dict]]:
+    """
+    Выполнить сценарии по разу и построить планы их SELECT-запросов.
+    Возвращает для каждого сценария запросы с полным чтением таблиц
+    """
+    user, _, guest = dataset['users'][:3]
+    clients = {
+        'user': make_client(user),
+        'guest': make_client(guest),
+        'anonymous': make_client(),
+    }
+    state, result = {}, {}
+    for scenario in build_scenarios(dataset):
+        if scenario['name'] == 'logout':
+            clients['guest'] = make_client(guest)
+        client = clients[scenario.get('client', 'user')]
+        with CaptureQueriesContext(connection) as queries:
+            _request(client, scenario, state)
+        flagged = []
+        for query in queries.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(query['sql'])
+            tables = [
+                table for table in seq_scans(plan)
+                if table not in ignore_tables
+            ]
+            if tables:
+                flagged.append(
+                    {'sql': query['sql'], 'tables': tables, 'plan': plan})
+        result[scenario['name']] = flagged
+    return result
+
+
+def compare_reports(old: dict, new: dict) -> list[str]:
+    """Сравнить два отчёта, вернуть строки с регрессиями по запросам"""
+    regressions = []
+    for name, metrics in new['endpoints'].items():
+        previous = old.get('endpoints', {}).get(name)
+        if previous and metrics['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов {previous["queries"]} -> '
+                f'{metrics["queries"]}')
+    return regressions
+
+
+def load_report(path: Path) -> dict:
+    """Прочитать сохранённый отчёт"""
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def default_ingredients_file() -> Path:
+    """Путь к каталогу ингредиентов из репозитория"""
+    return Path(settings.BASE_DIR).parent / 'data' / 'ingredients.csv'
@@ -0,0 +1,156 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+
+from food.models import Ingredient
+from foodgram.versions import bump_version, get_version
+
+RESPONSE_KEY: str = 'foodgram:response:{digest}'
+RESPONSE_STATS_KEY: str = 'foodgram:response:stats:{name}'
+
+
+class ResponseCacheStats:
+    """
+    Попадания и промахи кэша ответов.
+    Счётчики копятся в памяти процесса и переносятся в общий кэш
+    не чаще раза в RESPONSE_CACHE_STATS_INTERVAL секунд,
+    поэтому ответ из кэша не пишет в него
+    """
+    names = ('hits', 'misses')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.names, 0)
+        self._flushed = time.monotonic()
+
+    def record(self, hit: bool) -> None:
+        """Учесть попадание или промах"""
+        with self._lock:
+            self._counts['hits' if hit else 'misses'] += 1
+            if (time.monotonic() - self._flushed
+                    < settings.RESPONSE_CACHE_STATS_INTERVAL):
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """Перенести накопленные счётчики процесса в общий кэш"""
+        with self._lock:
+            counts = self._counts
+            self._counts = dict.fromkeys(self.names, 0)
+            self._flushed = time.monotonic()
+        for name, count in counts.items():
+            key = RESPONSE_STATS_KEY.format(name=name)
+            if not count or cache.add(key, count, timeout=None):
+                continue
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                # Счётчик мог быть вытеснен между add и incr
+                cache.set(key, count, timeout=None)
+
+    def get(self) -> dict[str, int | float]:
+        """Получить попадания, промахи и долю попаданий"""
+        self.flush()
+        stats = cache.get_many([
+            RESPONSE_STATS_KEY.format(name=name) for name in self.names])
+        hits, misses = (
+            stats.get(RESPONSE_STATS_KEY.format(name=name), 0)
+            for name in self.names
+        )
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'ratio': hits / total if total else 0.0,
+        }
+
+    def reset(self) -> None:
+        """Обнулить счётчики"""
+        with self._lock:
+            self._counts = dict.fromkeys(self.names, 0)
+        cache.delete_many([
+            RESPONSE_STATS_KEY.format(name=name) for name in self.names])
+
+
+response_cache_stats = ResponseCacheStats()
+
+
+def record_response_cache(hit: bool) -> None:
+    """Учесть попадание или промах кэша ответов"""
+    response_cache_stats.record(hit)
+
+
+class IngredientCatalogue:
+    """
+    Каталог ингредиентов в памяти процесса.
+    Названия в нижнем регистре хранятся отсортированными,
+    поиск по префиксу идёт бинарным поиском
+    """
+    version_name = 'ingredients'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked = None
+        self._names: list[str] = []
+        self._ingredients: list[Ingredient] = []
+
+    def _actual(self) -> tuple[list[str], list[Ingredient]]:
+        """
+        Получить каталог, перечитав его при смене версии.
+        Версия в общем кэше проверяется не чаще раза
+        в INGREDIENTS_CATALOGUE_CHECK_INTERVAL секунд
+        """
+        now = time.monotonic()
+        if self._checked is not None and (
+                now - self._checked
+                < settings.INGREDIENTS_CATALOGUE_CHECK_INTERVAL):
+            return self._names, self._ingredients
+        version = get_version(self.version_name)
+        self._checked = now
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    ingredients = sorted(
+                        Ingredient.objects.all(),
+                        key=lambda ingredient: ingredient.name.lower(),
+                    )
+                    self._names = [
+                        ingredient.name.lower() for ingredient in ingredients]
+                    self._ingredients = ingredients
+                    self._version = version
+        return self._names, self._ingredients
+
+    def search(self, name: str, limit: int) -> list[Ingredient]:
+        """Найти ингредиенты: сначала по префиксу, затем по вхождению"""
+        names, ingredients = self._actual()
+        name = name.lower()
+        start = bisect_left(names, name)
+        end = bisect_left(names, name + chr(sys.maxunicode), lo=start)
+        found = ingredients[start:min(end, start + limit)]
+        if len(found) < limit:
+            found.extend(islice(
+                (
+                    ingredient
+                    for num, ingredient in enumerate(ingredients)
+                    if name in names[num] and not start <= num < end
+                ),
+                limit - len(found),
+            ))
+        return found
+
+    def invalidate(self) -> None:
+        """
+        Сбросить каталог во всех процессах.
+        Текущий процесс перечитает версию при следующем поиске
+        """
+        bump_version(self.version_name)
+        self._checked = None
+
+
+ingredient_catalogue = IngredientCatalogue()
@@ -0,0 +1,125 @@
+import base64
+import binascii
+import hashlib
+import os
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField
+
+from food.images import rendition_url, verify_image
+
+
+IMAGE_SIGNATURES: tuple[tuple[bytes, str], ...] = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def guess_image_extension(data: bytes) -> str | None:
+    """Определить тип изображения по сигнатуре, не декодируя его"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return None
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Изображение рецепта в base64.
+    Проверяется только структура файла, без декодирования пикселей:
+    уменьшенные копии строятся в фоне после сохранения рецепта.
+    Неизменное изображение (URL текущего изображения или его копии,
+    либо base64 того же содержимого) пропускается: рецепт сохраняется
+    без записи файла и повторной обработки.
+    Вместо оригинала отдаёт URL уменьшенной копии,
+    если копия задана аргументом rendition или контекстом image_rendition
+    """
+    default_error_messages = {
+        'too_large': 'Размер изображения больше {max_size} байт',
+        'unknown_url': (
+            'Передайте изображение в base64 или URL текущего изображения'),
+    }
+
+    def __init__(self, *args, rendition: str = None, **kwargs):
+        self.rendition = rendition
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if (';base64,' not in base64_data
+                and base64_data.startswith(('http://', 'https://', '/'))):
+            if urlparse(base64_data).path in self.current_image_paths():
+                raise SkipField()
+            self.fail('unknown_url')
+        decoded_file = self.decode(base64_data)
+        extension = guess_image_extension(decoded_file)
+        if extension is None:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        try:
+            verify_image(decoded_file)
+        except ValueError as error:
+            raise ValidationError(str(error))
+        digest = hashlib.sha256(decoded_file).hexdigest()
+        if digest == self.current_image_digest():
+            raise SkipField()
+        return SimpleUploadedFile(
+            name=f'{digest}.{extension}',
+            content=decoded_file,
+        )
+
+    def decode(self, base64_data: str) -> bytes:
+        """Декодировать base64, проверив размер по длине строки"""
+        if ';base64,' in base64_data:
+            base64_data = base64_data.split(';base64,', 1)[1]
+        if len(base64_data) * 3 // 4 > settings.IMAGE_MAX_UPLOAD_SIZE:
+            self.fail('too_large', max_size=settings.IMAGE_MAX_UPLOAD_SIZE)
+        try:
+            return base64.b64decode(base64_data)
+        except (TypeError, binascii.Error, ValueError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+
+    def current_image(self):
+        """Изображение изменяемого рецепта"""
+        instance = getattr(self.parent, 'instance', None)
+        image = getattr(instance, self.source, None)
+        return image or None
+
+    def current_image_paths(self) -> set[str]:
+        """Пути URL текущего изображения и его копий"""
+        image = self.current_image()
+        if image is None:
+            return set()
+        names = {image.name}
+        for formats in (image.instance.image_renditions or {}).values():
+            if isinstance(formats, dict):
+                names.update(formats.values())
+        return {urlparse(image.storage.url(name)).path for name in names}
+
+    def current_image_digest(self) -> str | None:
+        """
+        Хэш содержимого текущего изображения.
+        Хранилище называет файлы по sha256, так что файл не читается
+        """
+        image = self.current_image()
+        if image is None:
+            return None
+        return os.path.splitext(os.path.basename(image.name))[0]
+
+    def to_representation(self, file):
+        rendition = self.rendition or self.context.get('image_rendition')
+        if not file or not rendition:
+            return super().to_representation(file)
+        url = rendition_url(file.instance, rendition)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
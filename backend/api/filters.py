@@ -1,27 +1,85 @@
+from django.conf import settings
+from django.db.models import BooleanField, Case, QuerySet, Value, When
 from django_filters import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.request import Request
+from rest_framework.views import APIView
 
+from .cache import ingredient_catalogue
 from food.models import Ingredient, Recipe, Tag
+from food.search import search_recipes
+from food.tags import filter_by_tags
 
 
-class IngredientFilter(SearchFilter):
+class IngredientFilter(BaseFilterBackend):
+    """
+    Автодополнение ингредиентов по названию:
+    сначала совпадения с начала названия, затем вхождения
+    """
     search_param = 'name'
+    limit_param = 'limit'
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def get_limit(self, request: Request) -> int:
+        """Получить ограничение выдачи, не больше настроенного"""
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return settings.INGREDIENTS_SEARCH_LIMIT
+        return max(1, min(limit, settings.INGREDIENTS_SEARCH_LIMIT))
+
+    def filter_queryset(
+        self, request: Request, queryset: QuerySet, view: APIView
+    ) -> QuerySet:
+        # Каталог хранится в нижнем регистре, а LIKE в SQLite
+        # не различает регистр только для латиницы.
+        name = request.query_params.get(self.search_param, '').strip().lower()
+        if not name or getattr(view, 'action', None) != 'list':
+            return queryset
+        if settings.INGREDIENTS_CATALOGUE_CACHE:
+            return ingredient_catalogue.search(name, self.get_limit(request))
+        return queryset.filter(
+            name__icontains=name
+        ).annotate(
+            is_prefix=Case(
+                When(name__istartswith=name, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        ).order_by('-is_prefix', 'name')[:self.get_limit(request)]
 
 
 class RecipeFilter(FilterSet):
+    tags_match = filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='filter_tags_match',
+    )
     tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = (
             'tags',
+            'tags_match',
             'author',
+            'search',
         )
+
+    def filter_tags_match(self, queryset: QuerySet, name: str, value: str):
+        """Режим учитывается в filter_tags"""
+        return queryset
+
+    def filter_tags(self, queryset: QuerySet, name: str, value: list[Tag]):
+        """Фильтр по маске тегов рецепта, без соединения с тегами"""
+        return filter_by_tags(
+            queryset, value,
+            match_all=self.form.cleaned_data.get('tags_match') == 'all',
+        )
+
+    def filter_search(self, queryset: QuerySet, name: str, value: str):
+        """Полнотекстовый поиск по названию, ингредиентам и описанию"""
+        return search_recipes(queryset, value)
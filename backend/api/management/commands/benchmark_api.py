@@ -0,0 +1,102 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from api.benchmark import (add_dataset_arguments, benchmark_settings,
+                           check_scaling, compare_reports, load_report,
+                           run_scenarios, seed_from_options, uncovered_routes)
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогнать все маршруты API на синтетических данных во временной '
+        'базе и замерить число запросов, p50/p95 задержки и пиковую память'
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--small-limit', type=int, default=6)
+        parser.add_argument('--large-limit', type=int, default=100)
+        parser.add_argument(
+            '--output', type=Path, help='Сохранить отчёт в JSON')
+        parser.add_argument(
+            '--compare', type=Path,
+            help='Сравнить с отчётом предыдущего прогона')
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        if not options['ingredients_file'].exists():
+            raise CommandError(
+                f'Файл {options["ingredients_file"]} не найден')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root, **benchmark_settings()
+                ):
+                    report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        errors = [
+            f'{name}: {result["small"]} запросов при limit='
+            f'{options["small_limit"]}, {result["large"]} при limit='
+            f'{options["large_limit"]}'
+            for name, result in report['scaling'].items()
+            if result['grows']
+        ]
+        if report['uncovered']:
+            errors.append(
+                'Маршруты без сценария: ' + ', '.join(report['uncovered']))
+        if options['compare']:
+            errors.extend(
+                compare_reports(load_report(options['compare']), report))
+        if errors:
+            raise CommandError('\n'.join(errors))
+
+    def run(self, options: dict) -> dict:
+        """Наполнить базу и выполнить замеры"""
+        dataset = seed_from_options(options)
+        report = {
+            'dataset': {
+                name: options[name]
+                for name in (
+                    'users', 'recipes', 'tags', 'favorites', 'carts',
+                    'subscriptions', 'ingredients_per_recipe', 'repeat',
+                )
+            },
+            'database': connection.vendor,
+            'endpoints': run_scenarios(dataset, options['repeat']),
+            'scaling': check_scaling(
+                dataset, options['small_limit'], options['large_limit']),
+            'uncovered': uncovered_routes(dataset),
+        }
+        return report
+
+    def print_report(self, report: dict) -> None:
+        """Вывести отчёт таблицей"""
+        self.stdout.write(
+            f'{"маршрут":<26}{"метод":>7}{"запросы":>9}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"память, КБ":>12}')
+        for name, metrics in report['endpoints'].items():
+            self.stdout.write(
+                f'{name:<26}{metrics["method"]:>7}{metrics["queries"]:>9}'
+                f'{metrics["p50_ms"]:>10}{metrics["p95_ms"]:>10}'
+                f'{metrics["peak_memory_kb"]:>12}')
+        for name, result in report['scaling'].items():
+            style = self.style.ERROR if result['grows'] else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name}: {result["small"]} -> {result["large"]} запросов'))
@@ -0,0 +1,71 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from api.benchmark import (EXPLAIN_SQL, add_dataset_arguments,
+                           benchmark_settings, explain_scenarios,
+                           seed_from_options)
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогнать маршруты API на синтетических данных во временной базе, '
+        'построить планы их запросов и найти полные чтения таблиц'
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument(
+            '--ignore', nargs='*', default=['food_tag'],
+            help='Таблицы, полное чтение которых допустимо')
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться ошибкой, если найдены полные чтения')
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in EXPLAIN_SQL:
+            raise CommandError(
+                f'Планы запросов для {connection.vendor} не поддерживаются')
+        if not options['ingredients_file'].exists():
+            raise CommandError(
+                f'Файл {options["ingredients_file"]} не найден')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root, **benchmark_settings()
+                ):
+                    dataset = seed_from_options(options)
+                    # Статистика нужна планировщику для выбора индексов
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+                    report = explain_scenarios(
+                        dataset, frozenset(options['ignore']))
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+        flagged = self.print_report(report, options['verbosity'])
+        if flagged and options['strict']:
+            raise CommandError(f'Запросов с полным чтением таблиц: {flagged}')
+
+    def print_report(self, report: dict, verbosity: int) -> int:
+        """Вывести маршруты с полными чтениями, вернуть число запросов"""
+        flagged = 0
+        for name, queries in report.items():
+            if not queries:
+                self.stdout.write(self.style.SUCCESS(f'{name}: ok'))
+                continue
+            flagged += len(queries)
+            for query in queries:
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: полное чтение {", ".join(query["tables"])}'))
+                self.stdout.write(f'    {query["sql"]}')
+                if verbosity > 1:
+                    for line in query['plan']:
+                        self.stdout.write(f'        {line}')
+        return flagged
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import response_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Показать долю попаданий кэша ответов для анонимных пользователей. '
+        'Процессы переносят счётчики в кэш раз в '
+        'RESPONSE_CACHE_STATS_INTERVAL секунд, общими для процессов '
+        'они бывают только при общем бэкенде кэша'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить счётчики')
+
+    def handle(self, *args, **options):
+        stats = response_cache_stats.get()
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {stats["ratio"]:.1%}')
+        if options['reset']:
+            response_cache_stats.reset()
+            self.stdout.write(self.style.SUCCESS('Счётчики обнулены'))
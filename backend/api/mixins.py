@@ -0,0 +1,186 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .cache import RESPONSE_KEY, record_response_cache
+from foodgram.versions import get_versions
+
+
+class DataVersionsMixin:
+    """
+    Версии данных, от которых зависит ответ.
+    Все версии запроса читаются из кэша одним get_many
+    и запоминаются в представлении до конца запроса
+    """
+    def get_data_version_names(self) -> list[str]:
+        """Имена всех версий, нужных запросу"""
+        return []
+
+    def get_data_versions(self, *names: str) -> list[int]:
+        """Получить версии names, при первом обращении прочитать все"""
+        if not hasattr(self, '_data_versions'):
+            self._data_versions = {}
+        missing = [
+            name
+            for name in dict.fromkeys(
+                (*self.get_data_version_names(), *names))
+            if name not in self._data_versions
+        ]
+        if missing:
+            self._data_versions.update(zip(missing, get_versions(*missing)))
+        return [self._data_versions[name] for name in names]
+
+
+class AnonymousCacheMixin(DataVersionsMixin):
+    """
+    Кэширование ответов list и retrieve для анонимных пользователей.
+    Ключ строится из пути, параметров запроса и версий данных,
+    от которых зависит ответ: при смене версии старые записи
+    просто перестают читаться
+    """
+    cache_list_versions: tuple[str, ...] = ()
+    cache_object_versions: tuple[str, ...] = ()
+
+    def get_cache_version_names(self) -> list[str]:
+        """Имена версий данных, от которых зависит ответ из кэша"""
+        names = (
+            self.cache_object_versions if self.action == 'retrieve'
+            else self.cache_list_versions
+        )
+        return [name.format(**self.kwargs) for name in names]
+
+    def get_data_version_names(self) -> list[str]:
+        names = super().get_data_version_names()
+        if self.request.user.is_anonymous:
+            names.extend(self.get_cache_version_names())
+        return names
+
+    def get_cache_versions(self) -> list[int]:
+        """Получить версии данных, от которых зависит ответ"""
+        return self.get_data_versions(*self.get_cache_version_names())
+
+    def get_response_cache_key(self, request: WSGIRequest) -> str:
+        """
+        Ключ ответа: хост, путь, отсортированные непустые параметры
+        и версии данных
+        """
+        params = urlencode(sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+            if value
+        ))
+        signature = '|'.join((
+            request.get_host(),
+            request.path,
+            params,
+            ','.join(map(str, self.get_cache_versions())),
+        ))
+        return RESPONSE_KEY.format(
+            digest=hashlib.md5(signature.encode()).hexdigest())
+
+    def cached_response(
+        self, handler, request: WSGIRequest, *args, **kwargs
+    ) -> Response:
+        """Вернуть ответ из кэша или вычислить и сохранить его"""
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            record_response_cache(hit=True)
+            return Response(data, headers={'X-Cache': 'HIT'})
+        record_response_cache(hit=False)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request: WSGIRequest, *args, **kwargs) -> Response:
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request: WSGIRequest, *args, **kwargs) -> Response:
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class ConditionalGetMixin(DataVersionsMixin):
+    """
+    ETag и Last-Modified для list и retrieve.
+    Валидаторы строятся из отметок версий данных,
+    поэтому 304 отдаётся без сериализации ответа
+    """
+    conditional_list_versions: tuple[str, ...] = ()
+    conditional_object_versions: tuple[str, ...] = ()
+    conditional_per_user: bool = False
+
+    def get_conditional_version_names(self) -> list[str]:
+        """Имена версий данных, от которых зависят ETag и Last-Modified"""
+        names = [
+            name.format(**self.kwargs)
+            for name in (
+                self.conditional_object_versions if self.action == 'retrieve'
+                else self.conditional_list_versions
+            )
+        ]
+        if self.conditional_per_user and self.request.user.is_authenticated:
+            names.append(f'user:{self.request.user.id}')
+        return names
+
+    def get_data_version_names(self) -> list[str]:
+        names = super().get_data_version_names()
+        names.extend(self.get_conditional_version_names())
+        return names
+
+    def get_conditional_stamps(self) -> list[int] | None:
+        """
+        Отметки времени в наносекундах, от которых зависит ответ.
+        None отключает проверку для запроса
+        """
+        return self.get_data_versions(*self.get_conditional_version_names())
+
+    def conditional_response(
+        self, handler, request: WSGIRequest, *args, **kwargs
+    ) -> HttpResponseBase:
+        """Ответить 304, если у клиента актуальная версия"""
+        stamps = self.get_conditional_stamps()
+        if not stamps:
+            return handler(request, *args, **kwargs)
+        per_user = (
+            self.conditional_per_user and request.user.is_authenticated)
+        signature = ':'.join((
+            request.accepted_renderer.format,
+            str(request.user.id) if per_user else '',
+            ','.join(map(str, stamps)),
+        ))
+        etag = quote_etag(hashlib.md5(signature.encode()).hexdigest())
+        timestamp = max(stamps) // 10 ** 9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(timestamp)
+        response['Cache-Control'] = (
+            'private, no-cache' if per_user else 'no-cache')
+        if self.conditional_per_user:
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request: WSGIRequest, *args, **kwargs) -> Response:
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request: WSGIRequest, *args, **kwargs) -> Response:
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
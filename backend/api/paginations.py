@@ -1,6 +1,246 @@
+import base64
+import binascii
+import datetime
+import hashlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram.versions import get_versions
 
 
 class FoodgrammPagination(pagination.PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+COUNT_KEY: str = 'foodgram:count:{signature}'
+
+
+def estimate_count(queryset: QuerySet) -> int | None:
+    """Оценка числа строк таблицы по статистике PostgreSQL"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            (connection.ops.quote_name(queryset.model._meta.db_table),),
+        )
+        row = cursor.fetchone()
+    # До первого ANALYZE reltuples равен -1
+    return row[0] if row and row[0] >= 0 else None
+
+
+def count_signature(queryset: QuerySet, versions: tuple = ()) -> str:
+    """
+    Подпись запроса и версий данных для ключа кэша.
+    Аннотации, не участвующие в фильтрах, в подпись не попадают
+    """
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    return hashlib.md5(repr((sql, params, versions)).encode()).hexdigest()
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator с кэшируемым или оценочным числом объектов.
+    Страница выбирается без оглядки на это число, оно лишь
+    уточняется по выбранным строкам
+    """
+    estimated = False
+
+    def __init__(self, *args, versions: tuple = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.versions = versions
+
+    def validate_number(self, number) -> int:
+        """Проверить номер страницы без сверки с числом страниц"""
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        seen = bottom + len(rows)
+        if has_next:
+            self.count = max(self.count, seen + 1)
+        else:
+            # На последней странице число объектов известно точно
+            self.count = seen
+            self.estimated = False
+        return self._get_page(rows, number, self)
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if not queryset.query.where:
+            estimate = estimate_count(queryset)
+            if (estimate is not None
+                    and estimate >= settings.COUNT_ESTIMATE_THRESHOLD):
+                self.estimated = True
+                return estimate
+        key = COUNT_KEY.format(
+            signature=count_signature(queryset, self.versions))
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class CachedCountPagination(FoodgrammPagination):
+    """
+    Постраничный вывод с кэшированием COUNT по подписи фильтров.
+    Для больших таблиц без фильтров берётся оценка PostgreSQL,
+    о чём говорит поле count_estimated.
+    В подпись входят версии данных из count_versions представления
+    и, при count_per_user, версия данных пользователя
+    """
+    def paginate_queryset(self, queryset: QuerySet, request, view=None):
+        self.count_versions = self.get_count_versions(request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    @staticmethod
+    def get_count_versions(request, view) -> tuple[int, ...]:
+        """Версии данных, от которых зависит число объектов"""
+        names = list(getattr(view, 'count_versions', ()))
+        if getattr(view, 'count_per_user', False) and (
+                request.user.is_authenticated):
+            names.append(f'user:{request.user.id}')
+        # Представление могло уже прочитать версии запроса
+        return tuple(getattr(view, 'get_data_versions', get_versions)(*names))
+
+    def django_paginator_class(self, *args, **kwargs) -> Paginator:
+        """DRF создаёт paginator через этот атрибут"""
+        return CachedCountPaginator(
+            *args, versions=self.count_versions, **kwargs)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_estimated', self.page.paginator.estimated),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class RecipePagination(CachedCountPagination):
+    """
+    Постраничный вывод рецептов.
+    С параметром cursor лента листается по ключу (pub_date, id)
+    без COUNT и OFFSET, без него работает как CachedCountPagination
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        reverse = position is not None and position[2]
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(*position))
+        ordering = ('pub_date', 'id') if reverse else ('-pub_date', '-id')
+        page = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else position is not None
+        self.page = page
+        return page
+
+    @staticmethod
+    def keyset_filter(pub_date: datetime.date, pk: int, reverse: bool) -> Q:
+        """
+        Условие для рецептов после ключа.
+        Первое сравнение по pub_date позволяет идти по индексу диапазоном
+        """
+        if reverse:
+            return Q(pub_date__gte=pub_date) & (
+                Q(pub_date__gt=pub_date) | Q(id__gt=pk))
+        return Q(pub_date__lte=pub_date) & (
+            Q(pub_date__lt=pub_date) | Q(id__lt=pk))
+
+    def decode_cursor(self, request) -> tuple | None:
+        """Разобрать курсор, пустой курсор означает первую страницу"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            pub_date, pk, reverse = base64.urlsafe_b64decode(
+                cursor.encode('ascii')).decode('ascii').split('|')
+            return (
+                datetime.date.fromisoformat(pub_date),
+                int(pk),
+                reverse == 'r',
+            )
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, recipe, reverse: bool) -> str:
+        """Получить ссылку на страницу после рецепта"""
+        position = '|'.join((
+            recipe.pub_date.isoformat(),
+            str(recipe.id),
+            'r' if reverse else 'f',
+        ))
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii'),
+        )
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
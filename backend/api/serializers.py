@@ -1,13 +1,20 @@
+import logging
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import F
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from rest_framework import serializers
 
-from .utils import (add_ingredients_in_recipe, check_ingredients, check_object,
-                    check_tags)
+from .fields import RecipeImageField
+from .utils import (add_ingredients_in_recipe, check_annotated_object,
+                    check_ingredients, check_object, check_tags,
+                    get_prefetched_or_query, to_positive_int,
+                    update_ingredients_in_recipe, update_tags_in_recipe)
+from food.images import RENDITION_FORMATS, rendition_url
 from food.models import Ingredient, IngredientsRecipes, Recipe, Tag
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -31,7 +38,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj: User):
         """Проверить на вхождение в подписки"""
-        return check_object(self, obj.subscriber)
+        return check_annotated_object(
+            self, obj, 'is_subscribed', obj.subscriber)
 
     def create(self, validated_data):
         """Создать пользователя"""
@@ -66,7 +74,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField(read_only=True, )
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True, )
-    image = Base64ImageField()
+    image = RecipeImageField()
+    image_renditions = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -79,25 +88,53 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_renditions',
+            'image_status',
             'text',
             'cooking_time',
         )
 
     def get_ingredients(self, obj: Recipe):
         """Получить ингредиенты рецепта с количеством"""
-        ingredients = obj.ingredients.values(
-            'id', 'name', 'measurement_unit',
-            amount=F('ingredient_in_recipe__amount')
-        )
-        return ingredients
+        return [
+            {
+                'id': ingredient_in_recipe.ingredient.id,
+                'name': ingredient_in_recipe.ingredient.name,
+                'measurement_unit':
+                    ingredient_in_recipe.ingredient.measurement_unit,
+                'amount': ingredient_in_recipe.amount,
+            }
+            for ingredient_in_recipe in get_prefetched_or_query(
+                obj, 'ingredient_in_recipe',
+                lambda queryset: queryset.select_related(
+                    'ingredient').order_by('ingredient__name'),
+            )
+        ]
 
     def get_is_favorited(self, obj: Recipe):
         """Проверить на вхождение в избранное"""
-        return check_object(self, obj.favorit_recipe)
+        return check_annotated_object(
+            self, obj, 'is_favorited', obj.favorit_recipe)
 
     def get_is_in_shopping_cart(self, obj: Recipe):
         """Проверить на вхождение в корзину покупок"""
-        return check_object(self, obj.shoping_card_recipe)
+        return check_annotated_object(
+            self, obj, 'is_in_shopping_cart', obj.shoping_card_recipe)
+
+    def get_image_renditions(self, obj: Recipe):
+        """Получить URL уменьшенных копий изображения в WebP и JPEG"""
+        if not obj.image:
+            return {}
+        request = self.context.get('request')
+        absolute_uri = request.build_absolute_uri if request else str
+        return {
+            rendition: {
+                extension: absolute_uri(
+                    rendition_url(obj, rendition, extension))
+                for extension in RENDITION_FORMATS
+            }
+            for rendition in settings.IMAGE_RENDITIONS
+        }
 
     def validate(self, data):
         """Валидмровать и нормализовать данные для создания рецепта"""
@@ -122,23 +159,24 @@ class RecipeSerializer(serializers.ModelSerializer):
         return recipe
 
     def update(self, instance, validated_data):
-        """Обновить рецепт"""
+        """Обновить рецепт, изменив только отличающиеся теги и ингредиенты"""
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        serializers.ValidationError(validated_data)
-        if tags:
-            instance.tags.clear()
-            instance.tags.set(tags)
-        if ingredients:
-            instance.ingredients.clear()
-            add_ingredients_in_recipe(
-                IngredientsRecipes, instance, ingredients)
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            touched = {
+                'tags': update_tags_in_recipe(instance, tags),
+                'ingredients': update_ingredients_in_recipe(
+                    IngredientsRecipes, instance, ingredients),
+            }
+            instance = super().update(instance, validated_data)
+        logger.debug('Рецепт %s обновлён, затронуто строк: %s',
+                     instance.id, touched)
+        return instance
 
 
 class RecipeBriefSerializer(serializers.ModelSerializer):
     """Сериализатор Recipe для емкого отображения  """
-    image = Base64ImageField()
+    image = RecipeImageField(rendition='thumb')
 
     class Meta:
         model = Recipe
@@ -150,11 +188,23 @@ class RecipeBriefSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления и удаления"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+    )
+
+    def validate_recipes(self, value: list[int]) -> list[int]:
+        """Убрать повторы, сохранив порядок"""
+        return list(dict.fromkeys(value))
+
+
 class UserSubscriptionsSerializer(UserSerializer):
     """Сериализатор UserCook для отображения модели в качестве подписаного """
     recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -176,19 +226,15 @@ class UserSubscriptionsSerializer(UserSerializer):
 
     def get_recipes(self, obj: User):
         """Получить рецепты подписаного пользователя"""
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes = obj.recipes.all()[:int(recipes_limit)]
-        else:
-            recipes = obj.recipes.all()
+        recipes = getattr(obj, 'brief_recipes', None)
+        if recipes is None:
+            request = self.context.get('request')
+            recipes_limit = to_positive_int(
+                request.query_params.get('recipes_limit'))
+            recipes = obj.recipes.all()[:recipes_limit]
         serializer = RecipeBriefSerializer(recipes, many=True,)
         return serializer.data
 
-    def get_recipes_count(self, obj: User):
-        """Получить количество рецептов подписаного пользователя"""
-        return obj.recipes.count()
-
     def get_is_subscribed(self, obj: User):
         """Проверить подписан ли пользователь, всегда да так в подписках"""
         return True
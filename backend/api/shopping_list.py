@@ -0,0 +1,143 @@
+import csv
+import json
+from datetime import date, datetime, time
+from hashlib import md5
+from io import BytesIO
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.db.models import Model, QuerySet
+from django.http import HttpResponseBase, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.request import Request
+
+from food.utils import CART_VERSION
+from foodgram.versions import get_versions
+
+CONTENT_TYPES: dict[str, str] = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+# Форматы с датой составления списка в заголовке
+DATED_FORMATS: tuple[str, ...] = ('txt', 'pdf')
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий строку вместо записи"""
+    def write(self, value: str) -> str:
+        return value
+
+
+def render_txt(ingredients: Iterable[dict]) -> Iterator[str]:
+    """Сформировать список текстом построчно"""
+    yield settings.FIRST_STRING_SHOPPING_LIST.format(today=date.today())
+    for num, ingredient in enumerate(ingredients, start=1):
+        yield settings.STRING_SHOPPING_LIST.format(number=num, **ingredient)
+
+
+def render_csv(ingredients: Iterable[dict]) -> Iterator[str]:
+    """Сформировать список в csv построчно"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('number', 'name', 'amount', 'measurement_unit'))
+    for num, ingredient in enumerate(ingredients, start=1):
+        yield writer.writerow((
+            num, ingredient['name'],
+            ingredient['amount'], ingredient['measurement_unit'],
+        ))
+
+
+def render_json(ingredients: Iterable[dict]) -> Iterator[str]:
+    """Сформировать список json-массивом по элементу"""
+    yield '['
+    for num, ingredient in enumerate(ingredients):
+        yield (',' if num else '') + json.dumps(
+            ingredient, ensure_ascii=False)
+    yield ']'
+
+
+def render_pdf(ingredients: Iterable[dict]) -> Iterator[bytes]:
+    """
+    Сформировать список в pdf.
+    Документ собирается целиком, строки читаются из курсора по мере записи
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    if 'ShoppingList' not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont('ShoppingList', settings.SHOPPING_LIST_PDF_FONT))
+    buffer = BytesIO()
+    document = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    margin, line_height = 50, 18
+    position = height - margin
+    for line in render_txt(ingredients):
+        if position < margin:
+            document.showPage()
+            position = height - margin
+        document.setFont('ShoppingList', 12)
+        document.drawString(margin, position, line.rstrip('\n'))
+        position -= line_height
+    document.save()
+    yield buffer.getvalue()
+
+
+RENDERERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'json': render_json,
+    'pdf': render_pdf,
+}
+
+
+def cart_validators(user: Model, file_format: str) -> tuple[str, int]:
+    """
+    Получить ETag и время изменения списка покупок без агрегации.
+    Строятся из версии корзины, которая меняется при добавлении
+    и удалении рецептов и изменении их ингредиентов, и версии
+    каталога ингредиентов. В txt и pdf учитывается и дата в заголовке
+    """
+    stamps = get_versions(
+        CART_VERSION.format(user_id=user.id), 'ingredients')
+    last_modified = max(stamps) // 10 ** 9
+    today = ''
+    if file_format in DATED_FORMATS:
+        today = date.today()
+        last_modified = max(
+            last_modified,
+            int(datetime.combine(today, time.min).timestamp()),
+        )
+    signature = f'{file_format}:{user.id}:{stamps}:{today}'
+    etag = quote_etag(md5(signature.encode()).hexdigest())
+    return etag, last_modified
+
+
+def shopping_list_response(
+    request: Request, ingredients: QuerySet, file_name: str
+) -> HttpResponseBase:
+    """
+    Отдать список покупок потоком в формате, выбранном рендерером.
+    Повторная загрузка неизменной корзины получает 304
+    """
+    file_format = request.accepted_renderer.format
+    etag, timestamp = cart_validators(request.user, file_format)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = StreamingHttpResponse(
+            RENDERERS[file_format](
+                ingredients.iterator(
+                    chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE)),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={file_name}.{file_format}')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(timestamp)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
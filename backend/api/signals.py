@@ -0,0 +1,85 @@
+from typing import Iterable
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import ingredient_catalogue
+from food.models import (Favorite, Ingredient, IngredientsRecipes, Recipe,
+                         ShoppingCart, Tag)
+from food.utils import bump_cart_versions
+from foodgram.versions import bump_version
+from user.models import Subscriptions
+
+User = get_user_model()
+
+
+def invalidate_recipes(*recipe_ids: int) -> None:
+    """Сбросить кэш ответов со списками и с указанными рецептами"""
+    names = ('recipes', *(f'recipe:{recipe_id}' for recipe_id in recipe_ids))
+    transaction.on_commit(lambda: bump_version(*names))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_catalogue(**kwargs) -> None:
+    """Сбросить каталог ингредиентов при изменении ингредиента"""
+    ingredient_catalogue.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(instance, **kwargs) -> None:
+    """Сбросить кэш ответов при изменении рецепта"""
+    invalidate_recipes(instance.id)
+
+
+@receiver((post_save, post_delete), sender=IngredientsRecipes)
+def invalidate_recipe_ingredients(instance, **kwargs) -> None:
+    """Сбросить кэш ответов при изменении ингредиентов рецепта"""
+    invalidate_recipes(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(instance, action, reverse, pk_set, **kwargs):
+    """Сбросить кэш ответов при изменении тегов рецепта"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipes(instance.id)
+    elif pk_set:
+        invalidate_recipes(*pk_set)
+    else:
+        invalidate_recipes()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag(**kwargs) -> None:
+    """Сбросить кэш ответов с тегами"""
+    transaction.on_commit(lambda: bump_version('tags'))
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_users(**kwargs) -> None:
+    """Сбросить закэшированное число пользователей"""
+    transaction.on_commit(lambda: bump_version('users'))
+
+
+def invalidate_links(model: type[Model], user_ids: Iterable[int]) -> None:
+    """
+    Сменить отметки пользователей, у которых изменились связи model:
+    флаги избранного, корзины или подписки, а для корзины и её версию
+    """
+    user_ids = list(user_ids)
+    names = [f'user:{user_id}' for user_id in user_ids]
+    transaction.on_commit(lambda: bump_version(*names))
+    if model is ShoppingCart:
+        bump_cart_versions(user_ids)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscriptions)
+def invalidate_user_links(sender, instance, **kwargs) -> None:
+    """Сбросить отметки пользователя при изменении его связи"""
+    invalidate_links(sender, (instance.user_id,))
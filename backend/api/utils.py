@@ -1,11 +1,27 @@
-from datetime import date
+from typing import Callable, Iterable
 
 from django.conf import settings
-from django.db.models import Model
+from django.db import connection, transaction
+from django.db.models import (BooleanField, Exists, Model, OuterRef, QuerySet,
+                              Value)
 from django.db.models.fields import related_descriptors
-from django.http import HttpResponse
 from rest_framework import serializers, status
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .signals import invalidate_links
+from food.counters import change_counter
+from food.utils import change_recipe_in_shopping_lists
+from user.models import Subscriptions
+
+INSERT_LINKS_SQL: str = (
+    'INSERT INTO {table} ({columns}) '
+    'SELECT {selected} FROM {target_table} WHERE {target_pk} IN ({pks}) '
+    'ON CONFLICT DO NOTHING RETURNING {target}'
+)
+DELETE_LINKS_SQL: str = (
+    'DELETE FROM {table} WHERE {conditions} RETURNING {target}'
+)
 
 
 def check_object(
@@ -21,6 +37,44 @@ def check_object(
     return obj.filter(user=user).exists()
 
 
+def check_annotated_object(
+    instans_class: serializers,
+    obj: Model,
+    annotation: str,
+    obj_manager: related_descriptors.ReverseManyToOneDescriptor
+) -> bool:
+    """
+    Взять флаг вхождения из аннотации queryset,
+    при её отсутствии проверить запросом
+    """
+    flag = getattr(obj, annotation, None)
+    if flag is None:
+        return check_object(instans_class, obj_manager)
+    return flag
+
+
+def get_prefetched_or_query(
+    obj: Model, related_name: str, optimize: Callable[[QuerySet], QuerySet]
+) -> Iterable[Model]:
+    """
+    Взять связанные объекты из prefetch-кэша,
+    при его отсутствии получить их оптимизированным запросом
+    """
+    if related_name in getattr(obj, '_prefetched_objects_cache', {}):
+        return getattr(obj, related_name).all()
+    return optimize(getattr(obj, related_name).all())
+
+
+def annotate_is_subscribed(queryset: QuerySet, user: Model) -> QuerySet:
+    """Аннотировать пользователей флагом подписки на них user"""
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField()))
+    return queryset.annotate(
+        is_subscribed=Exists(Subscriptions.objects.filter(
+            user=user, subscriber=OuterRef('pk'))))
+
+
 def add_ingredients_in_recipe(
     model: Model, recipe: Model, ingredients: list[tuple]
 ) -> None:
@@ -37,6 +91,66 @@ def add_ingredients_in_recipe(
     )
 
 
+def update_ingredients_in_recipe(
+    model: Model, recipe: Model, ingredients: list[tuple]
+) -> dict[str, int]:
+    """
+    Привести связующую м2м таблицу к переданным ингредиентам,
+    изменяя только отличающиеся строки
+    """
+    existing = {
+        row.ingredient_id: row
+        for row in model.objects.filter(recipe=recipe)
+    }
+    amounts = {ingredient.id: amount for ingredient, amount in ingredients}
+    created = model.objects.bulk_create(
+        [
+            model(recipe=recipe, ingredient_id=id, amount=amount)
+            for id, amount in amounts.items()
+            if id not in existing
+        ]
+    )
+    changed = [
+        row
+        for id, row in existing.items()
+        if id in amounts and row.amount != amounts[id]
+    ]
+    existing_amounts = {row.id: row.amount for row in changed}
+    for row in changed:
+        row.amount = amounts[row.ingredient_id]
+    model.objects.bulk_update(changed, ('amount',))
+    removed = [row.id for id, row in existing.items() if id not in amounts]
+    if removed:
+        model.objects.filter(id__in=removed).delete()
+    deltas = {row.ingredient_id: (row.amount, 1) for row in created}
+    deltas.update(
+        (row.ingredient_id, (row.amount - existing_amounts[row.id], 0))
+        for row in changed
+    )
+    deltas.update(
+        (id, (-row.amount, -1))
+        for id, row in existing.items()
+        if id not in amounts
+    )
+    change_recipe_in_shopping_lists(recipe, deltas)
+    return {
+        'created': len(created),
+        'updated': len(changed),
+        'deleted': len(removed),
+    }
+
+
+def update_tags_in_recipe(recipe: Model, tags: list) -> dict[str, int]:
+    """Привести теги рецепта к переданным, изменяя только отличающиеся"""
+    tags = {int(tag) for tag in tags}
+    existing = set(recipe.tags.values_list('id', flat=True))
+    if added := tags - existing:
+        recipe.tags.add(*added)
+    if removed := existing - tags:
+        recipe.tags.remove(*removed)
+    return {'created': len(added), 'deleted': len(removed)}
+
+
 def get_messege_incorect_obj(
     name: tuple[str],
     missing: list[str],
@@ -65,88 +179,244 @@ def check_tags(tags: list[str], model: Model) -> list[str]:
     return tags
 
 
+def to_positive_int(value: any) -> int | None:
+    """Привести значение к целому числу больше нуля, иначе None"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
 def check_ingredients(ingredients: list[dict], model: Model) -> list[tuple]:
-    """Проверять ингредиенты на соответствие"""
+    """
+    Проверить ингредиенты одним запросом к базе.
+    Ошибки возвращаются списком в порядке ингредиентов запроса
+    """
     if not ingredients:
         raise serializers.ValidationError(
             'Ингредиент необходиый атрибут')
-    ingredient_amount = list()
-    ingredient_missing, amount_incorrect = list(), list()
-    for ingredient in ingredients:
-        id, amount = ingredient.values()
-        ingredient_obj = model.objects.get(id=id)
-        if not ingredient_obj:
-            ingredient.append(str(id))
-        elif int(amount) < 1:
-            ingredient_name = model.objects.get(id=id)
-            amount_incorrect.append(f'"{ingredient_name.name}"')
-        ingredient_amount.append((ingredient_obj, amount,))
-
-    if ingredient_missing:
-        raise serializers.ValidationError(
-            get_messege_incorect_obj(
-                ("Ингредиенты:", "Ингредиент"), ingredient_missing)
-        )
-    if amount_incorrect:
+    if not isinstance(ingredients, list):
         raise serializers.ValidationError(
-            get_messege_incorect_obj(
-                ("У ингредиентов:", "у ингредиента"),
-                amount_incorrect,
-                ("некоректное количество", "некоректное количество")
-            )
+            'Ингредиенты должны быть списком.')
+    parsed = [
+        (
+            ingredient.get('id'),
+            to_positive_int(ingredient.get('id')),
+            to_positive_int(ingredient.get('amount')),
         )
+        if isinstance(ingredient, dict) else None
+        for ingredient in ingredients
+    ]
+    ingredients_obj = model.objects.in_bulk({
+        item[1] for item in parsed if item is not None and item[1] is not None
+    })
+    ingredient_amount, errors, seen = list(), list(), set()
+    for item in parsed:
+        if item is None:
+            errors.append({api_settings.NON_FIELD_ERRORS_KEY: [
+                'Ингредиент должен быть объектом с полями id и amount.']})
+            continue
+        raw_id, id, amount = item
+        error = dict()
+        ingredient_obj = ingredients_obj.get(id)
+        if raw_id in (None, ''):
+            error['id'] = [
+                serializers.Field.default_error_messages['required']]
+        elif ingredient_obj is None:
+            error['id'] = [f'Ингредиент {raw_id} '
+                           f'{settings.DEFOLT_MESSAGE_INCORECT_OBJ[1]}.']
+        elif id in seen:
+            error['id'] = [
+                f'Ингредиент "{ingredient_obj.name}" указан повторно.']
+        if amount is None:
+            error['amount'] = ['Некоректное количество.']
+        seen.add(id)
+        errors.append(error)
+        ingredient_amount.append((ingredient_obj, amount,))
+    if any(errors):
+        raise serializers.ValidationError({'ingredients': errors})
     return ingredient_amount
 
 
+def insert_links(
+    model: type[Model], field_name: str, pks: Iterable[int], **values
+) -> set[int]:
+    """
+    Связать values с существующими объектами из pks одним
+    INSERT ... ON CONFLICT DO NOTHING RETURNING,
+    вернуть pk объектов, связи с которыми созданы.
+    Сигналы не отправляются, кэш сбрасывает вызывающий
+    """
+    pks = list(pks)
+    if not pks:
+        return set()
+    opts = model._meta
+    target = opts.get_field(field_name)
+    obj = model(**values)
+    quote = connection.ops.quote_name
+    columns, selected, params = [], [], []
+    for field in opts.local_concrete_fields:
+        if field.primary_key:
+            continue
+        columns.append(quote(field.column))
+        if field is target:
+            selected.append(quote(target.target_field.column))
+            continue
+        selected.append('%s')
+        params.append(
+            field.get_db_prep_save(field.pre_save(obj, True), connection))
+    sql = INSERT_LINKS_SQL.format(
+        table=quote(opts.db_table),
+        columns=', '.join(columns),
+        selected=', '.join(selected),
+        target_table=quote(target.related_model._meta.db_table),
+        target_pk=quote(target.target_field.column),
+        pks=', '.join(['%s'] * len(pks)),
+        target=quote(target.column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*params, *pks))
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_links(
+    model: type[Model], field_name: str, pks: Iterable[int] = None, **values
+) -> set[int]:
+    """
+    Удалить связи values с объектами из pks, по умолчанию со всеми,
+    одним DELETE ... RETURNING, вернуть pk объектов удалённых связей.
+    Сигналы не отправляются, кэш сбрасывает вызывающий
+    """
+    opts = model._meta
+    target = opts.get_field(field_name)
+    quote = connection.ops.quote_name
+    conditions, params = [], []
+    for name, value in values.items():
+        conditions.append(f'{quote(opts.get_field(name).column)} = %s')
+        params.append(value.pk if isinstance(value, Model) else value)
+    if pks is not None:
+        pks = list(pks)
+        if not pks:
+            return set()
+        conditions.append(
+            f'{quote(target.column)} IN ({", ".join(["%s"] * len(pks))})')
+        params.extend(pks)
+    sql = DELETE_LINKS_SQL.format(
+        table=quote(opts.db_table),
+        conditions=' AND '.join(conditions),
+        target=quote(target.column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
 def add_obj_in_table(
         serialize: serializers.ModelSerializer,
         user: Model,
         obj: Model,
         obj_manager: related_descriptors.ReverseManyToOneDescriptor,
         error_message: str = 'Уже сделано',
+        counter: str = None,
 ) -> Response:
-    """Добавить obj в связную таблицу с user"""
-    if obj_manager.filter(user=user).exists():
-        return Response(
-            {'errors': error_message},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    obj_manager.create(user=user)
+    """
+    Добавить obj в связную таблицу с user,
+    увеличив счётчик counter у obj
+    """
+    model = obj_manager.model
+    with transaction.atomic():
+        if not insert_links(
+            model, obj_manager.field.name, (obj.pk,), user=user
+        ):
+            return Response(
+                {'errors': error_message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        invalidate_links(model, (user.id,))
+        if counter:
+            change_counter(type(obj), counter, 1, (obj.pk,))
     return Response(serialize(obj).data, status=status.HTTP_201_CREATED)
 
 
 def delete_obj_in_table(
         user: Model,
         obj_manager: related_descriptors.ReverseManyToOneDescriptor,
+        counter: str = None,
 ) -> Response:
-    """Удалить obj из связной таблицы с user"""
-    model = obj_manager.filter(user=user)
-    if not model.exists():
-        return Response(status=status.HTTP_400_BAD_REQUEST)
-    model.delete()
+    """
+    Удалить obj из связной таблицы с user,
+    уменьшив счётчик counter у obj
+    """
+    model, obj = obj_manager.model, obj_manager.instance
+    with transaction.atomic():
+        if not delete_links(
+            model, obj_manager.field.name, (obj.pk,), user=user
+        ):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        invalidate_links(model, (user.id,))
+        if counter:
+            change_counter(type(obj), counter, -1, (obj.pk,))
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def make_content_file(ingredients: list[dict]) -> list[str]:
-    """Сформировать содержание списка для отправки"""
-    content_file = [
-        settings.FIRST_STRING_SHOPPING_LIST.format(today=date.today()), ]
-    for num, ingredient in enumerate(ingredients, start=1):
-        name, m_unit, amount = ingredient.values()
-        content_file.append(
-            settings.STRING_SHOPPING_LIST.format(
-                number=num,
-                name=name,
-                amount=amount,
-                measurement_unit=m_unit,
-            ))
-    return content_file
+def add_objs_in_table(
+        user: Model,
+        model: type[Model],
+        field_name: str,
+        pks: list[int],
+        counter: str = None,
+) -> dict[int, str]:
+    """
+    Связать user с объектами pks и увеличить их счётчик counter.
+    Возвращает состояние по каждому pk: added, exists или not_found
+    """
+    target = model._meta.get_field(field_name).related_model
+    added = insert_links(model, field_name, pks, user=user)
+    if added:
+        invalidate_links(model, (user.id,))
+        if counter:
+            change_counter(target, counter, 1, added)
+    return _link_statuses(target, pks, added, settings.BULK_STATUS_ADDED,
+                          settings.BULK_STATUS_EXISTS)
 
 
-def sent_file(content: any, file_name: str) -> HttpResponse:
-    """Отправить содержание ввиде файла"""
-    response = HttpResponse(
-        content, content_type='text.txt; charset=utf-8'
-    )
-    response['Content-Disposition'] = f'attachment; filename={file_name}'
-    return response
+def remove_objs_in_table(
+        user: Model,
+        model: type[Model],
+        field_name: str,
+        pks: list[int] = None,
+        counter: str = None,
+) -> dict[int, str]:
+    """
+    Удалить связи user с объектами pks, по умолчанию все,
+    и уменьшить их счётчик counter.
+    Возвращает состояние по каждому pk: removed, missing или not_found
+    """
+    target = model._meta.get_field(field_name).related_model
+    removed = delete_links(model, field_name, pks, user=user)
+    if removed:
+        invalidate_links(model, (user.id,))
+        if counter:
+            change_counter(target, counter, -1, removed)
+    if pks is None:
+        return dict.fromkeys(sorted(removed), settings.BULK_STATUS_REMOVED)
+    return _link_statuses(target, pks, removed, settings.BULK_STATUS_REMOVED,
+                          settings.BULK_STATUS_MISSING)
+
+
+def _link_statuses(
+    target: type[Model], pks: list[int], changed: set[int],
+    changed_status: str, unchanged_status: str,
+) -> dict[int, str]:
+    """Состояния pk в порядке запроса, несуществующие — not_found"""
+    rest = [pk for pk in pks if pk not in changed]
+    existing = set(
+        target.objects.filter(pk__in=rest).values_list('pk', flat=True)
+    ) if rest else set()
+    return {
+        pk: changed_status if pk in changed
+        else unchanged_status if pk in existing
+        else settings.BULK_STATUS_NOT_FOUND
+        for pk in pks
+    }
@@ -1,23 +1,39 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.handlers.wsgi import WSGIRequest
-from django.db.models import QuerySet, Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              QuerySet, Value, Window)
+from django.db.models.functions import RowNumber
+from django.http import HttpResponseBase
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserViewSet
-from rest_framework import permissions, viewsets
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
 from .filters import IngredientFilter, RecipeFilter
-from .paginations import FoodgrammPagination
+from .mixins import AnonymousCacheMixin, ConditionalGetMixin
+from .paginations import CachedCountPagination, RecipePagination
 from .permission import RecipiesPermisionUserAutherAdmin
+from .renderers import (CsvShoppingListRenderer, PdfShoppingListRenderer,
+                        TxtShoppingListRenderer)
 from .serializers import (IngredientSerializer, RecipeBriefSerializer,
-                          RecipeSerializer, TagSerializer, UserSerializer,
+                          RecipeIdsSerializer, RecipeSerializer,
+                          TagSerializer, UserSerializer,
                           UserSubscriptionsSerializer)
-from .utils import (
-    add_obj_in_table, delete_obj_in_table, make_content_file, sent_file)
-from food.models import Ingredient, IngredientsRecipes, Recipe, Tag
+from .shopping_list import shopping_list_response
+from .utils import (add_obj_in_table, add_objs_in_table,
+                    annotate_is_subscribed, delete_obj_in_table,
+                    remove_objs_in_table, to_positive_int)
+from food.models import (Favorite, Ingredient, IngredientsRecipes, Recipe,
+                         ShoppingCart, ShoppingListItem, Tag)
+from food.utils import (add_recipe_to_shopping_list,
+                        add_recipes_to_shopping_list,
+                        remove_recipe_from_shopping_lists,
+                        remove_recipes_from_shopping_list)
 
 User = get_user_model()
 
@@ -26,7 +42,14 @@ class UserViewSet(DjoserViewSet, viewsets.ModelViewSet):
     """Представление работы с User"""
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    pagination_class = FoodgrammPagination
+    pagination_class = CachedCountPagination
+    count_versions = ('users',)
+    count_per_user = True
+
+    def get_queryset(self) -> QuerySet[User]:
+        """Получить пользователей с флагом подписки на них"""
+        return annotate_is_subscribed(
+            super().get_queryset(), self.request.user)
 
     @action(
         detail=False,
@@ -34,8 +57,24 @@ class UserViewSet(DjoserViewSet, viewsets.ModelViewSet):
         serializer_class=UserSubscriptionsSerializer,
     )
     def subscriptions(self, request: WSGIRequest) -> Response:
+        """Получить подписки с ограниченным числом рецептов каждого автора"""
+        recipes = Recipe.objects.all()
+        recipes_limit = to_positive_int(
+            request.query_params.get('recipes_limit'))
+        if recipes_limit:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=(F('pub_date').desc(), F('id').desc()),
+                )
+            ).filter(row_number__lte=recipes_limit)
         pages = self.paginate_queryset(
-            User.objects.filter(subscriber__user=request.user)
+            User.objects.filter(
+                subscriber__user=request.user
+            ).prefetch_related(
+                Prefetch('recipes', queryset=recipes, to_attr='brief_recipes')
+            )
         )
         serializer = self.get_serializer(pages, many=True)
         return self.get_paginated_response(serializer.data)
@@ -48,52 +87,107 @@ class UserViewSet(DjoserViewSet, viewsets.ModelViewSet):
     )
     def subscribe(self, request: WSGIRequest, id: str) -> Response:
         user = get_object_or_404(User, id=id)
+        if user == request.user:
+            return Response(
+                {'errors': 'Нельзя подписаться на себя'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return add_obj_in_table(
-            self.get_serializer, request.user, user, user.subscriber)
+            self.get_serializer, request.user, user, user.subscriber,
+            counter='subscribers_count')
 
     @subscribe.mapping.delete
     def subscriber_delete(self, request: WSGIRequest, id: str) -> Response:
         user = get_object_or_404(User, id=id)
         return delete_obj_in_table(
-            request.user, user.subscriber)
+            request.user, user.subscriber, counter='subscribers_count')
 
 
-class TagsViewSet(viewsets.ModelViewSet):
+class TagsViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Представление работы с Tag"""
     queryset = Tag.objects.all()
+    conditional_list_versions = ('tags',)
+    conditional_object_versions = ('tags',)
     serializer_class = TagSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
 
-class IngredientsViewSet(viewsets.ModelViewSet):
+class IngredientsViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Представление работы с Ingredient"""
     queryset = Ingredient.objects.all()
+    conditional_list_versions = ('ingredients',)
+    conditional_object_versions = ('ingredients',)
     serializer_class = IngredientSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
     pagination_class = None
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.select_related('author').all()
+class RecipesViewSet(
+    ConditionalGetMixin, AnonymousCacheMixin, viewsets.ModelViewSet
+):
+    queryset = Recipe.objects.all()
+    cache_list_versions = ('recipes', 'tags', 'ingredients')
+    cache_object_versions = ('recipe:{pk}', 'tags', 'ingredients')
+    conditional_list_versions = ('recipes', 'tags', 'ingredients')
+    conditional_object_versions = ('tags', 'ingredients')
+    conditional_per_user = True
     serializer_class = RecipeSerializer
-    pagination_class = FoodgrammPagination
+    pagination_class = RecipePagination
+    count_versions = ('recipes',)
+    count_per_user = True
     permission_classes = (RecipiesPermisionUserAutherAdmin,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_serializer_context(self) -> dict:
+        """В списке рецептов отдавать изображения карточек"""
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['image_rendition'] = 'card'
+        return context
+
+    def get_conditional_stamps(self) -> list[int] | None:
+        """Для одного рецепта учесть дату его изменения из базы"""
+        stamps = super().get_conditional_stamps()
+        if self.action != 'retrieve':
+            return stamps
+        updated = Recipe.objects.filter(
+            pk=to_positive_int(self.kwargs['pk'])
+        ).values_list('updated', flat=True).first()
+        if updated is None:
+            return None
+        return [*stamps, int(updated.timestamp() * 10 ** 9)]
+
     def get_queryset(self) -> QuerySet[Recipe]:
         """Получить queryset в зависимости от переданных параметров"""
         user = self.request.user
-        queryset_optimal = Recipe.objects.select_related('author')
+        queryset = super().get_queryset().prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_in_recipe',
+                queryset=IngredientsRecipes.objects.select_related(
+                    'ingredient').order_by('ingredient__name'),
+            ),
+            Prefetch('author', queryset=annotate_is_subscribed(
+                User.objects.all(), user)),
+        )
         if user.is_anonymous:
-            return super().get_queryset()
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        queryset = queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
         if self.request.query_params.get('is_favorited'):
-            return queryset_optimal.filter(favorit_recipe__user=user)
+            return queryset.filter(is_favorited=True)
         if self.request.query_params.get('is_in_shopping_cart'):
-            return queryset_optimal.filter(shoping_card_recipe__user=user)
-        return super().get_queryset()
+            return queryset.filter(is_in_shopping_cart=True)
+        return queryset
 
     @action(
         detail=True,
@@ -106,14 +200,14 @@ class RecipesViewSet(viewsets.ModelViewSet):
         recipe = get_object_or_404(Recipe, id=pk)
         return add_obj_in_table(
             self.get_serializer, request.user, recipe,
-            recipe.favorit_recipe)
+            recipe.favorit_recipe, counter='favorites_count')
 
     @favorite.mapping.delete
     def favotite_delete(self, request: WSGIRequest, pk: str) -> Response:
         """Удалить рецепт из избранного"""
         recipe = get_object_or_404(Recipe, id=pk)
         return delete_obj_in_table(
-            request.user, recipe.favorit_recipe)
+            request.user, recipe.favorit_recipe, counter='favorites_count')
 
     @action(
         detail=True,
@@ -124,33 +218,141 @@ class RecipesViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, request: WSGIRequest, pk: str) -> Response:
         """Добавить рецепт в корзину"""
         recipe = get_object_or_404(Recipe, id=pk)
-        return add_obj_in_table(
-            self.get_serializer, request.user, recipe,
-            recipe.shoping_card_recipe)
+        with transaction.atomic():
+            response = add_obj_in_table(
+                self.get_serializer, request.user, recipe,
+                recipe.shoping_card_recipe, counter='in_carts_count')
+            if response.status_code == status.HTTP_201_CREATED:
+                add_recipe_to_shopping_list(request.user, recipe)
+        return response
 
     @shopping_cart.mapping.delete
     def shopping_cart_delete(self, request: WSGIRequest, pk: str) -> Response:
         """Удалить рецепт из корзины"""
         recipe = get_object_or_404(Recipe, id=pk)
-        return delete_obj_in_table(
-            request.user, recipe.shoping_card_recipe)
+        with transaction.atomic():
+            response = delete_obj_in_table(
+                request.user, recipe.shoping_card_recipe,
+                counter='in_carts_count')
+            if response.status_code == status.HTTP_204_NO_CONTENT:
+                remove_recipe_from_shopping_lists(recipe, (request.user,))
+        return response
+
+    def get_recipe_ids(self, request: WSGIRequest) -> list[int]:
+        """Проверить список id рецептов пакетного запроса"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes']
+
+    @staticmethod
+    def bulk_response(results: dict[int, str]) -> Response:
+        """Ответ пакетного запроса с состоянием каждого рецепта"""
+        return Response({'recipes': [
+            {'id': pk, 'status': result} for pk, result in results.items()
+        ]})
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='favorite',
+        url_name='favorite-bulk',
+        serializer_class=RecipeIdsSerializer,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def favorite_bulk(self, request: WSGIRequest) -> Response:
+        """Добавить в избранное несколько рецептов"""
+        recipe_ids = self.get_recipe_ids(request)
+        with transaction.atomic():
+            results = add_objs_in_table(
+                request.user, Favorite, 'recipe', recipe_ids,
+                counter='favorites_count')
+        return self.bulk_response(results)
+
+    @favorite_bulk.mapping.delete
+    def favorite_bulk_delete(self, request: WSGIRequest) -> Response:
+        """Удалить из избранного несколько рецептов"""
+        recipe_ids = self.get_recipe_ids(request)
+        with transaction.atomic():
+            results = remove_objs_in_table(
+                request.user, Favorite, 'recipe', recipe_ids,
+                counter='favorites_count')
+        return self.bulk_response(results)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
+        serializer_class=RecipeIdsSerializer,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def shopping_cart_bulk(self, request: WSGIRequest) -> Response:
+        """Добавить в корзину несколько рецептов"""
+        recipe_ids = self.get_recipe_ids(request)
+        with transaction.atomic():
+            results = add_objs_in_table(
+                request.user, ShoppingCart, 'recipe', recipe_ids,
+                counter='in_carts_count')
+            add_recipes_to_shopping_list(request.user, [
+                pk for pk, result in results.items()
+                if result == settings.BULK_STATUS_ADDED
+            ])
+        return self.bulk_response(results)
+
+    @shopping_cart_bulk.mapping.delete
+    def shopping_cart_bulk_delete(self, request: WSGIRequest) -> Response:
+        """Удалить из корзины несколько рецептов"""
+        recipe_ids = self.get_recipe_ids(request)
+        with transaction.atomic():
+            results = remove_objs_in_table(
+                request.user, ShoppingCart, 'recipe', recipe_ids,
+                counter='in_carts_count')
+            remove_recipes_from_shopping_list(request.user, [
+                pk for pk, result in results.items()
+                if result == settings.BULK_STATUS_REMOVED
+            ])
+        return self.bulk_response(results)
+
+    @action(
+        detail=False,
+        methods=['delete'],
+        url_path='shopping_cart/clear',
+        url_name='shopping-cart-clear',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def shopping_cart_clear(self, request: WSGIRequest) -> Response:
+        """Очистить корзину"""
+        with transaction.atomic():
+            results = remove_objs_in_table(
+                request.user, ShoppingCart, 'recipe',
+                counter='in_carts_count')
+            ShoppingListItem.objects.filter(user=request.user).delete()
+        return self.bulk_response(results)
 
     @action(
         detail=False,
         permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            TxtShoppingListRenderer, CsvShoppingListRenderer,
+            JSONRenderer, PdfShoppingListRenderer,
+        ),
     )
-    def download_shopping_cart(self, request: WSGIRequest) -> HttpResponse:
-        """Отправить сформированный список ингредиентов из рецептов"""
+    def download_shopping_cart(
+        self, request: WSGIRequest
+    ) -> HttpResponseBase:
+        """
+        Отправить сформированный список ингредиентов из рецептов
+        в формате txt, csv, json или pdf
+        """
         user = request.user
-        file_name = f'{user.username}-byu-list.txt'
-        all_ingredient = IngredientsRecipes.objects.filter(
-            recipe__shoping_card_recipe__user=user
+        all_ingredient = ShoppingListItem.objects.filter(
+            user=user
         ).order_by(
             'ingredient__name'
         ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            amount=Sum('amount')
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+            amount=F('total_amount'),
         )
-        content_file = make_content_file(all_ingredient)
-        return sent_file(content_file, file_name)
+        return shopping_list_response(
+            request, all_ingredient, f'{user.username}-byu-list')
@@ -1,8 +1,12 @@
 from django.conf import settings
 from django.contrib import admin
+from django.db.models import Q
 from django.utils.html import format_html, format_html_join
 
-from .models import Ingredient, IngredientsRecipes, Recipe, Tag
+from .counters import change_counter
+from .models import Ingredient, IngredientsRecipes, Recipe, Tag, User
+from .search import search_filter, uses_search_vector
+from .utils import rebuild_shopping_lists
 
 
 class IngredientsInline(admin.TabularInline):
@@ -45,10 +49,39 @@ class RecipesAdmin(admin.ModelAdmin):
         'author', 'show_favorit', 'pub_date',
     )
     search_fields = ('name', 'text', 'author__username', 'tags__name')
-    list_filter = ('author', 'cooking_time', 'pub_date',)
+    list_filter = ('author', 'tags', 'cooking_time', 'pub_date',)
     inlines = (IngredientsInline,)
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        На PostgreSQL искать по поисковому вектору и имени автора
+        вместо icontains по связанным таблицам
+        """
+        if not search_term or not uses_search_vector(queryset.db):
+            return super().get_search_results(
+                request, queryset, search_term)
+        return queryset.filter(
+            search_filter(search_term, queryset.db)
+            | Q(author__username__icontains=search_term)
+        ), False
+
+    def save_model(self, request, obj, form, change):
+        """Перенести рецепт в счётчиках авторов при смене автора"""
+        super().save_model(request, obj, form, change)
+        if change and 'author' in form.changed_data:
+            change_counter(
+                User, 'recipes_count', -1, (form.initial['author'],))
+            change_counter(User, 'recipes_count', 1, (obj.author_id,))
+
+    def save_related(self, request, form, formsets, change):
+        """Пересобрать списки покупок тех, у кого рецепт в корзине"""
+        super().save_related(request, form, formsets, change)
+        if change:
+            rebuild_shopping_lists(
+                form.instance.shoping_card_recipe.values_list(
+                    'user_id', flat=True))
+
     @admin.display(description='Превью блюда')
     def show_preview(self, obj: Recipe) -> str:
         images_column: str = format_html(
@@ -81,6 +114,6 @@ class RecipesAdmin(admin.ModelAdmin):
         ]
         return ingredients_column
 
-    @admin.display(description='В избранном',)
+    @admin.display(description='В избранном', ordering='favorites_count')
     def show_favorit(self, obj: Recipe) -> str:
-        return obj.favorit_recipe.count()
+        return obj.favorites_count
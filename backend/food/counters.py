@@ -0,0 +1,65 @@
+from typing import Iterable
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Model, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipe, ShoppingCart
+from user.models import Subscriptions
+
+User = get_user_model()
+
+
+def counters() -> tuple[tuple[type[Model], str, type[Model], str], ...]:
+    """Счётчики: модель, поле, связанная модель и её внешний ключ"""
+    return (
+        (Recipe, 'favorites_count', Favorite, 'recipe'),
+        (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+        (User, 'recipes_count', Recipe, 'author'),
+        (User, 'subscribers_count', Subscriptions, 'subscriber'),
+    )
+
+
+def change_counter(
+    model: type[Model], field: str, delta: int, pks: Iterable[int]
+) -> int:
+    """
+    Атомарно изменить счётчик у объектов с первичными ключами pks.
+    Разошедшийся счётчик не уходит ниже нуля, его чинит сверка
+    """
+    objects = model.objects.filter(pk__in=list(pks))
+    if delta < 0:
+        objects = objects.filter(**{f'{field}__gte': -delta})
+    return objects.update(**{field: F(field) + delta})
+
+
+def actual_count(related: type[Model], foreign_key: str) -> Coalesce:
+    """Подзапрос с числом связанных строк"""
+    return Coalesce(Subquery(
+        related.objects.filter(
+            **{foreign_key: OuterRef('pk')}
+        ).order_by().values(
+            foreign_key
+        ).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def reconcile_counters(dry_run: bool = False) -> dict[str, int]:
+    """
+    Сверить счётчики с таблицами связей и исправить расхождения
+    одним UPDATE на счётчик. Возвращает число исправленных строк
+    """
+    result = {}
+    for model, field, related, foreign_key in counters():
+        drifted = model.objects.alias(
+            actual=actual_count(related, foreign_key)
+        ).exclude(**{field: F('actual')})
+        name = f'{model._meta.model_name}.{field}'
+        if dry_run:
+            result[name] = drifted.count()
+        else:
+            result[name] = drifted.update(
+                **{field: actual_count(related, foreign_key)})
+    return result
@@ -0,0 +1,155 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ImageStatus, Recipe
+from foodgram.versions import bump_version
+
+RENDITION_FORMATS: dict[str, str] = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+ALLOWED_FORMATS: tuple[str, ...] = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+logger = logging.getLogger(__name__)
+
+
+class ImageTooLarge(ValueError):
+    """Изображение больше допустимого числа пикселей"""
+
+
+def check_image(image: Image.Image) -> None:
+    """Проверить формат и число пикселей по заголовку изображения"""
+    if image.format not in ALLOWED_FORMATS:
+        raise ValueError(f'Неподдерживаемый формат {image.format}')
+    if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(
+            f'Изображение больше {settings.IMAGE_MAX_PIXELS} пикселей')
+
+
+def verify_image(data: bytes) -> None:
+    """
+    Проверить структуру файла изображения без декодирования пикселей.
+    Повреждённый файл отклоняется до сохранения рецепта
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValueError('Файл изображения повреждён')
+    check_image(image)
+
+
+def open_image(file) -> Image.Image:
+    """
+    Декодировать изображение один раз, ограничив его размер,
+    с учётом поворота из EXIF
+    """
+    image = Image.open(file)
+    check_image(image)
+    # JPEG можно декодировать сразу в уменьшенном масштабе
+    largest = max(settings.IMAGE_RENDITIONS.values())
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    return image
+
+
+def _save_rendition(
+    image: Image.Image, name: str, image_format: str, storage: Storage
+) -> str:
+    """
+    Сохранить копию и вернуть её имя.
+    Хранилище называет файл по содержимому, name задаёт каталог и расширение
+    """
+    buffer = io.BytesIO()
+    image.save(
+        buffer, image_format, quality=settings.IMAGE_RENDITION_QUALITY,
+        optimize=True)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build_renditions(name: str, storage: Storage = None) -> dict:
+    """
+    Построить уменьшенные копии изображения name рядом с оригиналом,
+    по умолчанию в хранилище изображений рецептов.
+    Копии строятся от большей к меньшей, каждая из предыдущей.
+    Возвращает {'source': name, rendition: {format: name}}
+    """
+    if storage is None:
+        storage = Recipe._meta.get_field('image').storage
+    with storage.open(name) as file:
+        image = open_image(file)
+    stem = os.path.splitext(name)[0]
+    renditions = {'source': name}
+    for rendition, side in sorted(
+        settings.IMAGE_RENDITIONS.items(),
+        key=lambda item: item[1],
+        reverse=True,
+    ):
+        image = image.copy()
+        image.thumbnail((side, side), Image.Resampling.LANCZOS)
+        renditions[rendition] = {
+            extension: _save_rendition(
+                image, f'{stem}_{rendition}.{extension}',
+                image_format, storage)
+            for extension, image_format in RENDITION_FORMATS.items()
+        }
+    return renditions
+
+
+def renditions_outdated(recipe) -> bool:
+    """Проверить, построены ли копии для текущего изображения рецепта"""
+    return bool(recipe.image) and (
+        (recipe.image_renditions or {}).get('source') != recipe.image.name)
+
+
+def process_recipe_image(recipe_id: int) -> str | None:
+    """
+    Проверить изображение рецепта, построить копии и сохранить
+    состояние обработки. Если изображение заменили во время обработки,
+    обрабатывается уже новое
+    """
+    while True:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is None or not renditions_outdated(recipe):
+            return None
+        name = recipe.image.name
+        try:
+            renditions = build_renditions(name, recipe.image.storage)
+            status = ImageStatus.READY
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.exception(
+                'Не удалось обработать изображение рецепта %s', recipe_id)
+            # Источник запоминается, чтобы не обрабатывать его повторно
+            renditions, status = {'source': name}, ImageStatus.FAILED
+        if Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image_renditions=renditions,
+            image_status=status,
+            updated=timezone.now(),
+        ):
+            # update не отправляет сигналы, кэш ответов сбрасывается здесь
+            transaction.on_commit(
+                lambda: bump_version('recipes', f'recipe:{recipe_id}'))
+            return status
+
+
+def rendition_url(recipe, rendition: str, extension: str = 'jpeg') -> str:
+    """URL копии изображения, либо оригинала, если копии ещё нет"""
+    renditions = recipe.image_renditions or {}
+    if renditions.get('source') == recipe.image.name:
+        name = renditions.get(rendition, {}).get(extension)
+        if name:
+            return recipe.image.storage.url(name)
+    return recipe.image.url
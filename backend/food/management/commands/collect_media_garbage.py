@@ -0,0 +1,88 @@
+import os
+from datetime import timedelta
+from typing import Iterator
+
+from django.core.files.storage import Storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from food.models import Recipe
+
+
+def walk(storage: Storage, path: str) -> Iterator[str]:
+    """Обойти файлы каталога хранилища рекурсивно"""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield os.path.join(path, name)
+    for directory in directories:
+        yield from walk(storage, os.path.join(path, directory))
+
+
+def referenced_files() -> set[str]:
+    """Файлы, на которые ссылаются рецепты: оригиналы и копии"""
+    names = set()
+    for image, renditions in Recipe.objects.values_list(
+        'image', 'image_renditions'
+    ).iterator():
+        names.add(image)
+        for formats in (renditions or {}).values():
+            if isinstance(formats, dict):
+                names.update(formats.values())
+    return names
+
+
+def is_referenced(name: str) -> bool:
+    """Проверить по базе, ссылается ли на файл какой-либо рецепт"""
+    return Recipe.objects.alias(
+        renditions=Cast('image_renditions', TextField())
+    ).filter(
+        Q(image=name) | Q(renditions__contains=f'"{name}"')
+    ).exists()
+
+
+class Command(BaseCommand):
+    help = (
+        'Удалить файлы изображений, на которые не ссылается ни один рецепт. '
+        'Свежие файлы не трогаются: их рецепт может ещё сохраняться'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Не удалять файлы моложе указанного числа часов')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        if options['grace_hours'] < 0:
+            raise CommandError('--grace-hours не может быть отрицательным')
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        deadline = timezone.now() - timedelta(hours=options['grace_hours'])
+        # Ссылки читаются до обхода одним запросом, файлы новых рецептов
+        # защищает deadline, а кандидаты перед удалением перепроверяются
+        referenced = referenced_files()
+        removed, size = 0, 0
+        for name in walk(storage, field.upload_to.rstrip('/')):
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name) > deadline:
+                continue
+            # Рецепт мог сослаться на файл уже после чтения ссылок
+            if is_referenced(name):
+                continue
+            removed += 1
+            size += storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {size / 1024 / 1024:.1f} МБ'))
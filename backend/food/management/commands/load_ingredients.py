@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from food.models import Ingredient
+from foodgram.versions import bump_version
+
+READ_BUFFER_SIZE: int = 64 * 1024
+
+
+def iter_csv(file: TextIO) -> Iterator[dict]:
+    """Построчно читать ингредиенты из csv с заголовком"""
+    yield from csv.DictReader(file)
+
+
+def iter_json(file: TextIO) -> Iterator[dict]:
+    """
+    Читать объекты из json-массива по одному,
+    не загружая файл в память целиком
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_BUFFER_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидался json-массив объектов')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_BUFFER_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный json-массив')
+            buffer += chunk
+            continue
+        yield obj
+        buffer = buffer[end:]
+
+
+def normalize(rows: Iterable[dict]) -> Iterator[tuple[str, str]]:
+    """Привести строки к паре (name, measurement_unit), пропуская пустые"""
+    for row in rows:
+        name = (row.get('name') or '').strip()
+        measurement_unit = (row.get('measurement_unit') or '').strip()
+        if name and measurement_unit:
+            yield name, measurement_unit
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[list]:
+    """Разбить поток на пачки по size элементов"""
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def upsert_bulk(rows: Iterable[tuple[str, str]], chunk_size: int) -> int:
+    """Загрузить пачками через bulk_create с обновлением при конфликте"""
+    total = 0
+    for chunk in chunked(rows, chunk_size):
+        # В одной пачке имя должно встречаться один раз,
+        # иначе ON CONFLICT DO UPDATE затронет строку дважды.
+        unique = dict(chunk)
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in unique.items()
+            ],
+            update_conflicts=True,
+            unique_fields=('name',),
+            update_fields=('measurement_unit',),
+        )
+        total += len(chunk)
+    return total
+
+
+def upsert_copy(rows: Iterable[tuple[str, str]], chunk_size: int) -> int:
+    """
+    Загрузить через COPY во временную таблицу PostgreSQL
+    и перенести в каталог одним INSERT ... ON CONFLICT
+    """
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE ingredient_staging '
+            '(num bigserial, name text, measurement_unit text) '
+            'ON COMMIT DROP'
+        )
+        for chunk in chunked(rows, chunk_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(chunk)
+            buffer.seek(0)
+            cursor.copy_expert(
+                'COPY ingredient_staging (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+            total += len(chunk)
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            'SELECT DISTINCT ON (name) name, measurement_unit '
+            'FROM ingredient_staging ORDER BY name, num DESC '
+            'ON CONFLICT ON CONSTRAINT unique_ingredient '
+            'DO UPDATE SET measurement_unit = EXCLUDED.measurement_unit'
+        )
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузить каталог ингредиентов из csv или json '
+        'с обновлением существующих по названию'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        readers = {'csv': iter_csv, 'json': iter_json}
+        if file_format not in readers:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля')
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy'])
+        upsert = upsert_copy if use_copy else upsert_bulk
+        start = time.perf_counter()
+        with open(path, encoding='utf-8', newline='') as file:
+            total = upsert(
+                normalize(readers[file_format](file)), options['chunk_size'])
+        elapsed = time.perf_counter() - start
+        # bulk_create и COPY не отправляют сигналы моделей,
+        # поэтому каталог ингредиентов сбрасывается сменой версии
+        bump_version('ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {total} за {elapsed:.2f} с '
+            f'({total / elapsed if elapsed else total:.0f} строк/с, '
+            f'{"COPY" if use_copy else "bulk_create"})'
+        ))
@@ -0,0 +1,87 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from PIL import Image
+
+from food.images import build_renditions
+from food.models import ImageStatus, Recipe
+from foodgram.versions import bump_version
+
+
+def build_for_recipe(item: tuple[int, str]) -> tuple[int, dict, str]:
+    """Построить копии в дочернем процессе, не обращаясь к базе"""
+    recipe_id, name = item
+    try:
+        return recipe_id, build_renditions(name), ''
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        return recipe_id, {}, str(error)
+
+
+class Command(BaseCommand):
+    help = (
+        'Построить уменьшенные копии изображений рецептов (WebP и JPEG) '
+        'в пуле процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов, по умолчанию по числу ядер')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить и уже построенные копии')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError(
+                '--workers и --batch-size должны быть больше нуля')
+        todo = [
+            (recipe_id, image)
+            for recipe_id, image, renditions in Recipe.objects.exclude(
+                image=''
+            ).order_by(
+                'id'
+            ).values_list(
+                'id', 'image', 'image_renditions'
+            )
+            if options['force'] or (renditions or {}).get('source') != image
+        ]
+        start = time.perf_counter()
+        # Соединения с базой не должны наследоваться дочерними процессами
+        connections.close_all()
+        done, failed, batch = [], 0, []
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for recipe_id, renditions, error in pool.map(
+                build_for_recipe, todo, chunksize=4
+            ):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'Рецепт {recipe_id}: {error}')
+                    continue
+                batch.append(Recipe(
+                    id=recipe_id,
+                    image_renditions=renditions,
+                    image_status=ImageStatus.READY,
+                    updated=timezone.now(),
+                ))
+                if len(batch) >= options['batch_size']:
+                    done.extend(self.save(batch))
+                    batch = []
+        done.extend(self.save(batch))
+        bump_version(
+            'recipes', *(f'recipe:{recipe_id}' for recipe_id in done))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {len(done)}, с ошибками: {failed} '
+            f'за {time.perf_counter() - start:.2f} с'))
+
+    def save(self, batch: list[Recipe]) -> list[int]:
+        """Сохранить копии пачки рецептов"""
+        Recipe.objects.bulk_update(
+            batch, ('image_renditions', 'image_status', 'updated'))
+        return [recipe.id for recipe in batch]
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from food.tasks import work_database_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрабатывать изображения рецептов из очереди в базе данных '
+        '(IMAGE_TASK_BACKEND=food.tasks.DatabaseBackend)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Пауза между проверками пустой очереди, с')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить накопившиеся задачи и завершиться')
+
+    def handle(self, *args, **options):
+        work_database_queue(options['poll_interval'], options['once'])
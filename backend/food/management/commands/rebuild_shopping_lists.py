@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from food.models import ShoppingListItem
+from food.utils import live_shopping_lists, rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобрать сводные списки покупок из корзин '
+        'и сверить их с агрегацией по корзинам'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help='Только сверить, не пересобирая')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            with transaction.atomic():
+                total = rebuild_shopping_lists(
+                    batch_size=options['batch_size'])
+            self.stdout.write(f'Пересобрано позиций: {total}')
+        mismatches = self.verify()
+        if mismatches:
+            raise CommandError(
+                f'Расхождений с корзинами: {mismatches}')
+        self.stdout.write(self.style.SUCCESS(
+            'Списки покупок совпадают с корзинами'))
+
+    def verify(self) -> int:
+        """Посчитать позиции, расходящиеся с агрегацией по корзинам"""
+        live = {
+            (row['user_id'], row['ingredient_id']):
+                (row['total_amount'], row['recipe_count'])
+            for row in live_shopping_lists().iterator()
+        }
+        stored = {
+            (row['user_id'], row['ingredient_id']):
+                (row['total_amount'], row['recipe_count'])
+            for row in ShoppingListItem.objects.values(
+                'user_id', 'ingredient_id', 'total_amount', 'recipe_count'
+            ).iterator()
+        }
+        return sum(
+            live.get(key) != stored.get(key)
+            for key in live.keys() | stored.keys()
+        )
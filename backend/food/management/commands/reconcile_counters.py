@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from food.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверить счётчики избранного, корзин, рецептов и подписчиков '
+        'с таблицами связей и исправить расхождения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число расхождений')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            result = reconcile_counters(dry_run=options['dry_run'])
+        for name, drifted in result.items():
+            style = self.style.WARNING if drifted else self.style.SUCCESS
+            self.stdout.write(style(f'{name}: {drifted}'))
+        verb = 'Расходится' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(f'{verb} строк: {sum(result.values())}')
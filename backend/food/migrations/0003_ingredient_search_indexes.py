@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from food.operations import PostgreSQLRunSQL, PostgreSQLTrigramExtension
+
+# LIKE по UPPER(name) — так Django строит icontains/istartswith
+# для PostgreSQL. На остальных СУБД индексы не создаются.
+CREATE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS food_ingredient_name_upper_trgm '
+    'ON food_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS food_ingredient_name_upper_prefix '
+    'ON food_ingredient (UPPER(name::text) text_pattern_ops)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS food_ingredient_name_upper_trgm',
+    'DROP INDEX IF EXISTS food_ingredient_name_upper_prefix',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0002_initial'),
+    ]
+
+    operations = [
+        PostgreSQLTrigramExtension(),
+        PostgreSQLRunSQL(CREATE_INDEXES, DROP_INDEXES),
+    ]
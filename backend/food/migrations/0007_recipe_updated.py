@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0006_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_comment='Дата последнего изменения рецепта(авто)', verbose_name='Дата изменения'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0007_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions',
+            field=models.JSONField(blank=True, db_comment='Уменьшенные копии изображения в WebP и JPEG', default=dict, editable=False, verbose_name='Копии изображения'),
+        ),
+    ]
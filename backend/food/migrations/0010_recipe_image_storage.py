@@ -0,0 +1,19 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:04
+
+from django.db import migrations, models
+import food.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0009_image_tasks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_comment='Изображение рецепта', help_text='Выберете илюстрацию рецепта', storage=food.storage.ContentAddressedStorage(), upload_to='food_images/', verbose_name='Готовый результат'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:06
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from food.operations import PostgreSQLRunSQL
+
+# Индекс и заполнение только для PostgreSQL, на остальных СУБД
+# поиск идёт через LIKE и колонка остаётся пустой.
+CREATE_SEARCH = (
+    'CREATE INDEX IF NOT EXISTS food_recipe_search_vector_gin '
+    'ON food_recipe USING gin (search_vector)',
+    "UPDATE food_recipe AS recipe SET search_vector = "
+    "setweight(to_tsvector('russian', COALESCE(recipe.name, '')), 'A') "
+    "|| setweight(to_tsvector('russian', COALESCE(("
+    "SELECT string_agg(ingredient.name, ' ') "
+    "FROM food_ingredientsrecipes AS link "
+    "JOIN food_ingredient AS ingredient ON ingredient.id = link.ingredient_id "
+    "WHERE link.recipe_id = recipe.id), '')), 'B') "
+    "|| setweight(to_tsvector('russian', COALESCE(recipe.text, '')), 'C')",
+)
+DROP_SEARCH = (
+    'DROP INDEX IF EXISTS food_recipe_search_vector_gin',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0010_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        PostgreSQLRunSQL(CREATE_SEARCH, DROP_SEARCH),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:40
+
+import django.core.validators
+from django.db import migrations, models
+
+TAG_BITS = 63
+
+
+def assign_tag_bits(apps, schema_editor):
+    Tag = apps.get_model('food', 'Tag')
+    tags = list(Tag.objects.order_by('id'))
+    if len(tags) > TAG_BITS:
+        raise ValueError(f'Тегов больше {TAG_BITS}, маска не поместится')
+    for bit, tag in enumerate(tags):
+        tag.bit = bit
+    Tag.objects.bulk_update(tags, ('bit',))
+
+
+def fill_tags_masks(apps, schema_editor):
+    Recipe = apps.get_model('food', 'Recipe')
+    masks = {}
+    links = Recipe.tags.through.objects.values_list('recipe_id', 'tag__bit')
+    for recipe_id, bit in links.iterator():
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ('tags_mask',),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0011_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(db_comment='Номер бита тега в маске рецепта', editable=False, null=True, unique=True, validators=[django.core.validators.MaxValueValidator(62)], verbose_name='Бит в маске'),
+        ),
+        migrations.RunPython(assign_tag_bits, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(db_comment='Номер бита тега в маске рецепта', editable=False, unique=True, validators=[django.core.validators.MaxValueValidator(62)], verbose_name='Бит в маске'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(db_comment='Битовая маска тегов рецепта(авто)', default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.1 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def related_count(model, foreign_key):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{foreign_key: OuterRef('pk')}
+        ).order_by().values(foreign_key).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('food', 'Recipe')
+    Favorite = apps.get_model('food', 'Favorite')
+    ShoppingCart = apps.get_model('food', 'ShoppingCart')
+    CookUser = apps.get_model('user', 'CookUser')
+    Subscriptions = apps.get_model('user', 'Subscriptions')
+    Recipe.objects.update(
+        favorites_count=related_count(Favorite, 'recipe'),
+        in_carts_count=related_count(ShoppingCart, 'recipe'),
+    )
+    CookUser.objects.update(
+        recipes_count=related_count(Recipe, 'author'),
+        subscribers_count=related_count(Subscriptions, 'subscriber'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0013_composite_indexes'),
+        ('user', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_comment='Сколько пользователей добавили рецепт в избранное(авто)', default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(db_comment='В скольких корзинах рецепт(авто)', default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
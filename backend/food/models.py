@@ -1,9 +1,19 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.validators import MinValueValidator, RegexValidator
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
+from django.core.validators import (MaxValueValidator, MinValueValidator,
+                                    RegexValidator)
 from django.db import models
+
+from .storage import ContentAddressedStorage
+from user.models import CountersMixin
+
 User = get_user_model()
 
+# Маска тегов рецепта хранится в знаковом bigint
+TAG_BITS: int = 63
+
 
 class Tag(models.Model):
     """
@@ -17,6 +27,8 @@ class Tag(models.Model):
         Цвет в формате HEX.(#F3F366)
     slug  :  str
         Слаг для Тега. (breakfast)
+    bit  :  int
+        Номер бита тега в маске рецепта(авто)
     """
     name = models.CharField(
         'Название',
@@ -48,6 +60,13 @@ class Tag(models.Model):
             message=settings.MESSAGE_SLUG_TAG,
         )]
     )
+    bit = models.PositiveSmallIntegerField(
+        'Бит в маске',
+        unique=True,
+        editable=False,
+        db_comment='Номер бита тега в маске рецепта',
+        validators=[MaxValueValidator(TAG_BITS - 1)],
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -63,6 +82,24 @@ class Tag(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    @staticmethod
+    def free_bit() -> int:
+        """Младший свободный бит маски"""
+        used = set(Tag.objects.values_list('bit', flat=True))
+        for bit in range(TAG_BITS):
+            if bit not in used:
+                return bit
+        raise ValidationError(f'Тегов не может быть больше {TAG_BITS}')
+
+    def clean(self) -> None:
+        if self.bit is None:
+            self.free_bit()
+
+    def save(self, *args, **kwargs) -> None:
+        if self.bit is None:
+            self.bit = self.free_bit()
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     """
@@ -103,7 +140,14 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class ImageStatus(models.TextChoices):
+    """Состояние обработки изображения рецепта"""
+    PENDING = 'pending', 'Обрабатывается'
+    READY = 'ready', 'Готово'
+    FAILED = 'failed', 'Ошибка'
+
+
+class Recipe(CountersMixin, models.Model):
     """
     Модель рецептов
     ...
@@ -141,11 +185,30 @@ class Recipe(models.Model):
                 subscriptions
     cooking_time : int
         Время приготовления
+    pub_date : date
+        Дата создания(авто)
+    updated : datetime
+        Дата последнего изменения(авто)
+    image_renditions : dict
+        Уменьшенные копии изображения(авто)
+    search_vector : tsvector
+        Поисковый вектор по названию, ингредиентам и описанию(авто),
+        ведётся только на PostgreSQL
+    image_status : str
+        Состояние фоновой обработки изображения(авто)
+    tags_mask : int
+        Битовая маска тегов рецепта по Tag.bit(авто)
+    favorites_count : int
+        Сколько пользователей добавили рецепт в избранное(авто)
+    in_carts_count : int
+        В скольких корзинах рецепт(авто)
     """
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
+        # Покрыт индексом recipe_author_pub_date_idx
+        db_index=False,
         verbose_name='Автор',
         db_comment='Автор рецепта',
         help_text='Выберете автора',
@@ -157,6 +220,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Готовый результат',
         upload_to='food_images/',
+        storage=ContentAddressedStorage(),
         db_comment='Изображение рецепта',
         help_text='Выберете илюстрацию рецепта',
     )
@@ -212,11 +276,64 @@ class Recipe(models.Model):
         db_comment='Дата добавления рецепта(авто)',
         auto_now_add=True,
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        db_comment='Дата последнего изменения рецепта(авто)',
+        auto_now=True,
+    )
+    tags_mask = models.BigIntegerField(
+        'Маска тегов',
+        default=0,
+        editable=False,
+        db_comment='Битовая маска тегов рецепта(авто)',
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+        db_comment='Сколько пользователей добавили рецепт в избранное(авто)',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В корзинах',
+        default=0,
+        editable=False,
+        db_comment='В скольких корзинах рецепт(авто)',
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    image_status = models.CharField(
+        'Обработка изображения',
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.READY,
+        editable=False,
+        db_comment='Состояние фоновой обработки изображения',
+    )
+    image_renditions = models.JSONField(
+        'Копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+        db_comment='Уменьшенные копии изображения в WebP и JPEG',
+    )
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+    background_fields = ('search_vector', 'image_status', 'image_renditions')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -289,12 +406,16 @@ class Favorite(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='favorit_user_recipe',
+        # Покрыт уникальным ограничением (user, recipe)
+        db_index=False,
         verbose_name='Пользователь',
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name='favorit_recipe',
+        # Покрыт индексом (recipe, user)
+        db_index=False,
         verbose_name='Рецепт',
     )
 
@@ -308,6 +429,11 @@ class Favorite(models.Model):
                 name='unique_favorit',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='favorite_recipe_user_idx'),
+        )
 
 
 class ShoppingCart(models.Model):
@@ -326,19 +452,29 @@ class ShoppingCart(models.Model):
         по fk с моделью Recipe
         Поля:   author, name, image, text, tags, ingredients,
                 favorited, shopping_cart, cooking_time
+    added : datetime
+        Дата добавления в корзину(авто)
     """
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='shoping_card_recipe',
+        # Покрыт уникальным ограничением (user, recipe)
+        db_index=False,
         verbose_name='Пользователь',
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name='shoping_card_recipe',
+        # Покрыт индексом (recipe, user)
+        db_index=False,
         verbose_name='Рецепт',
     )
+    added = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+    )
 
     class Meta:
         verbose_name = 'Добавил в корзину'
@@ -350,3 +486,86 @@ class ShoppingCart(models.Model):
                 name='unique_shoping_card',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='shopping_cart_recipe_user_idx'),
+        )
+
+
+class ShoppingListItem(models.Model):
+    """
+    Сводный список покупок пользователя,
+    поддерживается при изменении корзины и ингредиентов рецептов
+    ...
+    Attributes
+    ----------
+    user  :  int
+        Владелец списка,
+        по fk с моделью CookUser(AbstractUser)
+    ingredient : int
+        Ингредиент,
+        по fk с моделью Ingredient
+    total_amount : int
+        Суммарное количество ингредиента в рецептах корзины
+    recipe_count : int
+        Число рецептов корзины с этим ингредиентом
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='in_shopping_lists',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField(
+        'Количество',
+    )
+    recipe_count = models.PositiveIntegerField(
+        'Рецептов с ингредиентом',
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        ordering = ['user']
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item',
+            ),
+        )
+
+
+class ImageTask(models.Model):
+    """
+    Задача обработки изображения в очереди в базе данных
+    ...
+    Attributes
+    ----------
+    recipe : int
+        Рецепт, изображение которого нужно обработать,
+        по fk с моделью Recipe
+    created : datetime
+        Дата постановки в очередь(авто)
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_tasks',
+        verbose_name='Рецепт',
+    )
+    created = models.DateTimeField(
+        'Дата постановки',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Задача обработки изображения'
+        verbose_name_plural = 'Задачи обработки изображений'
+        ordering = ['id']
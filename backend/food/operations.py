@@ -0,0 +1,32 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class PostgreSQLOnlyMixin:
+    """
+    Операция миграции, которая выполняется только на PostgreSQL.
+    На остальных СУБД она ничего не делает в обе стороны
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state)
+
+
+class PostgreSQLRunSQL(PostgreSQLOnlyMixin, migrations.RunSQL):
+    """RunSQL только для PostgreSQL"""
+
+
+class PostgreSQLTrigramExtension(PostgreSQLOnlyMixin, TrigramExtension):
+    """
+    Расширение pg_trgm. В Django 4.2 откат CreateExtension
+    не проверяет СУБД, поэтому проверка вынесена сюда
+    """
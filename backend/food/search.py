@@ -0,0 +1,86 @@
+from typing import Iterable
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, transaction
+from django.db.models import Exists, F, OuterRef, Q, QuerySet, Subquery
+
+from .models import IngredientsRecipes, Recipe
+
+SEARCH_CONFIG: str = 'russian'
+
+
+def uses_search_vector(using: str = 'default') -> bool:
+    """Поисковый вектор ведётся только на PostgreSQL"""
+    return connections[using].vendor == 'postgresql'
+
+
+def recipe_search_vector() -> SearchVector:
+    """
+    Вектор рецепта: название важнее ингредиентов,
+    ингредиенты важнее описания
+    """
+    # Агрегаты contrib.postgres требуют psycopg2 при импорте
+    from django.contrib.postgres.aggregates import StringAgg
+    ingredient_names = Subquery(
+        IngredientsRecipes.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values(
+            'recipe'
+        ).annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids: Iterable[int] = None) -> int:
+    """Пересчитать поисковые векторы рецептов, по умолчанию всех"""
+    if not uses_search_vector():
+        return 0
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=list(recipe_ids))
+    return recipes.update(search_vector=recipe_search_vector())
+
+
+def schedule_search_update(recipe_ids: Iterable[int]) -> None:
+    """Пересчитать векторы после фиксации транзакции"""
+    if not uses_search_vector():
+        return
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+def search_filter(text: str, using: str = 'default') -> Q:
+    """
+    Условие поиска по названию, описанию и ингредиентам.
+    Без PostgreSQL — LIKE по тем же полям
+    """
+    if uses_search_vector(using):
+        return Q(search_vector=SearchQuery(
+            text, config=SEARCH_CONFIG, search_type='websearch'))
+    return (
+        Q(name__icontains=text)
+        | Q(text__icontains=text)
+        | Q(Exists(IngredientsRecipes.objects.filter(
+            recipe=OuterRef('pk'), ingredient__name__icontains=text)))
+    )
+
+
+def search_recipes(queryset: QuerySet, text: str) -> QuerySet:
+    """Найти рецепты, на PostgreSQL упорядочив их по релевантности"""
+    text = text.strip()
+    if not text:
+        return queryset
+    queryset = queryset.filter(search_filter(text, queryset.db))
+    if not uses_search_vector(queryset.db):
+        return queryset
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.annotate(
+        search_rank=SearchRank(F('search_vector'), query)
+    ).order_by('-search_rank', '-pub_date', '-id')
@@ -0,0 +1,99 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .counters import change_counter
+from .images import renditions_outdated
+from .models import (ImageStatus, Ingredient, IngredientsRecipes, Recipe, Tag,
+                     User)
+from .search import schedule_search_update
+from .tags import drop_tag_bit, update_tags_mask
+from .tasks import enqueue_image_processing
+from .utils import remove_recipe_from_shopping_lists
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe_from_shopping_lists(instance, **kwargs) -> None:
+    """Вычесть удаляемый рецепт из списков покупок"""
+    remove_recipe_from_shopping_lists(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def enqueue_image_renditions(instance, **kwargs) -> None:
+    """
+    Поставить новое изображение рецепта в очередь на обработку.
+    Рецепт в состоянии pending уже стоит в очереди: задача
+    перечитает рецепт и обработает новое изображение
+    """
+    if not renditions_outdated(instance):
+        return
+    # Экземпляр мог быть загружен до окончания обработки
+    instance.image_renditions, instance.image_status = Recipe.objects.filter(
+        pk=instance.pk
+    ).values_list(
+        'image_renditions', 'image_status'
+    ).get()
+    if not renditions_outdated(instance):
+        return
+    queued = Recipe.objects.filter(
+        pk=instance.pk
+    ).exclude(
+        image_status=ImageStatus.PENDING
+    ).update(
+        image_status=ImageStatus.PENDING
+    )
+    instance.image_status = ImageStatus.PENDING
+    if queued:
+        enqueue_image_processing(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(instance, **kwargs) -> None:
+    """Пересчитать поисковый вектор сохранённого рецепта"""
+    schedule_search_update((instance.id,))
+
+
+@receiver((post_save, post_delete), sender=IngredientsRecipes)
+def update_ingredients_search_vector(instance, **kwargs) -> None:
+    """Пересчитать поисковый вектор рецепта при смене его ингредиентов"""
+    schedule_search_update((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search_vector(instance, **kwargs) -> None:
+    """Пересчитать поисковые векторы рецептов с изменённым ингредиентом"""
+    schedule_search_update(
+        instance.ingredient_in_recipe.values_list('recipe_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_recipe_tags_mask(instance, action, reverse, pk_set, **kwargs):
+    """Пересчитать маски тегов рецептов при изменении связей с тегами"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        # Экземпляр могут сохранить ещё раз, маска не должна откатиться
+        instance.tags_mask = update_tags_mask((instance.id,))[instance.id]
+    elif action == 'post_clear':
+        drop_tag_bit(instance.bit)
+    else:
+        update_tags_mask(pk_set)
+
+
+@receiver(post_delete, sender=Tag)
+def drop_deleted_tag_bit(instance, **kwargs) -> None:
+    """Снять бит удалённого тега, чтобы его мог занять новый тег"""
+    drop_tag_bit(instance.bit)
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(instance, created, **kwargs) -> None:
+    """Учесть новый рецепт в счётчике автора"""
+    if created:
+        change_counter(User, 'recipes_count', 1, (instance.author_id,))
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(instance, **kwargs) -> None:
+    """Вычесть удалённый рецепт из счётчика автора"""
+    change_counter(User, 'recipes_count', -1, (instance.author_id,))
@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE: int = 64 * 1024
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, называющее файлы по sha256 содержимого:
+    <каталог>/<хэш><расширение>.
+    Одинаковые файлы хранятся один раз, повторная запись только
+    обновляет дату изменения файла,
+    а неизменность файла по имени позволяет кэшировать его бессрочно
+    """
+
+    def content_name(self, name: str, content) -> str:
+        """Получить имя файла по хэшу его содержимого"""
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        directory, base_name = os.path.split(name)
+        extension = os.path.splitext(base_name)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            try:
+                # Свежая дата изменения защищает файл от сборки мусора
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                # Файл удалили между проверкой и обновлением даты
+                pass
+        return super().save(name, content, max_length)
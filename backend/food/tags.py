@@ -0,0 +1,58 @@
+from typing import Iterable
+
+from django.db.models import F, QuerySet
+
+from .models import Recipe, Tag
+
+
+def tags_mask(tags: Iterable[Tag]) -> int:
+    """Маска из битов тегов"""
+    mask = 0
+    for tag in tags:
+        mask |= 1 << tag.bit
+    return mask
+
+
+def update_tags_mask(recipe_ids: Iterable[int]) -> dict[int, int]:
+    """Пересчитать маски тегов рецептов по их связям с тегами"""
+    masks = dict.fromkeys(recipe_ids, 0)
+    if not masks:
+        return masks
+    links = Recipe.tags.through.objects.filter(
+        recipe_id__in=masks
+    ).values_list('recipe_id', 'tag__bit')
+    for recipe_id, bit in links:
+        masks[recipe_id] |= 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ('tags_mask',),
+        batch_size=1000,
+    )
+    return masks
+
+
+def drop_tag_bit(bit: int) -> int:
+    """Снять бит удалённого тега со всех рецептов"""
+    return Recipe.objects.alias(
+        tag_bit=F('tags_mask').bitand(1 << bit)
+    ).filter(
+        tag_bit__gt=0
+    ).update(
+        tags_mask=F('tags_mask').bitxor(1 << bit)
+    )
+
+
+def filter_by_tags(
+    queryset: QuerySet, tags: Iterable[Tag], match_all: bool = False
+) -> QuerySet:
+    """
+    Рецепты хотя бы с одним из тегов, либо со всеми тегами,
+    без соединения с таблицей связей
+    """
+    mask = tags_mask(tags)
+    if not mask:
+        return queryset
+    queryset = queryset.alias(tags_match=F('tags_mask').bitand(mask))
+    if match_all:
+        return queryset.filter(tags_match=mask)
+    return queryset.filter(tags_match__gt=0)
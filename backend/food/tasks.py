@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connection, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .images import process_recipe_image
+from .models import ImageTask
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPoolBackend:
+    """
+    Обработка изображений в пуле потоков текущего процесса.
+    Задачи, не выполненные до остановки процесса, теряются:
+    их догоняет команда make_image_renditions
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_TASK_WORKERS,
+            thread_name_prefix='image-task',
+        )
+
+    def submit(self, recipe_id: int) -> None:
+        self._executor.submit(self._run, recipe_id)
+
+    @staticmethod
+    def _run(recipe_id: int) -> None:
+        try:
+            process_recipe_image(recipe_id)
+        except Exception:
+            logger.exception('Задача обработки рецепта %s упала', recipe_id)
+        finally:
+            # У каждого потока своё соединение с базой
+            connection.close()
+
+
+class DatabaseBackend:
+    """
+    Очередь задач в таблице ImageTask.
+    Задачи выполняет команда process_image_tasks
+    """
+
+    def submit(self, recipe_id: int) -> None:
+        ImageTask.objects.create(recipe_id=recipe_id)
+
+
+class DisabledBackend:
+    """
+    Задачи не выполняются: изображения остаются в состоянии pending,
+    копии строит команда make_image_renditions
+    """
+
+    def submit(self, recipe_id: int) -> None:
+        pass
+
+
+def run_database_task() -> bool:
+    """
+    Выполнить одну задачу из очереди в базе в своей транзакции.
+    Упавшая задача удаляется, изображение остаётся в состоянии pending
+    до команды make_image_renditions.
+    Вернуть False, если свободных задач нет
+    """
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        task = ImageTask.objects.select_for_update(
+            skip_locked=skip_locked).first()
+        if task is None:
+            return False
+        try:
+            with transaction.atomic():
+                process_recipe_image(task.recipe_id)
+        except Exception:
+            logger.exception(
+                'Задача обработки рецепта %s упала', task.recipe_id)
+        task.delete()
+    return True
+
+
+def run_database_tasks(batch_size: int = 10) -> int:
+    """
+    Выполнить до batch_size задач из очереди в базе, вернуть их число.
+    На PostgreSQL несколько обработчиков не берут одну задачу дважды
+    """
+    done = 0
+    while done < batch_size and run_database_task():
+        done += 1
+    return done
+
+
+def work_database_queue(poll_interval: float, once: bool = False) -> None:
+    """Выполнять задачи из очереди в базе, ожидая новые"""
+    while True:
+        close_old_connections()
+        done = run_database_tasks()
+        if once and not done:
+            return
+        if not done:
+            time.sleep(poll_interval)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Получить обработчик задач, заданный IMAGE_TASK_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.IMAGE_TASK_BACKEND)()
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting: str, **kwargs) -> None:
+    """Пересоздать обработчик при смене IMAGE_TASK_BACKEND"""
+    global _backend
+    if setting == 'IMAGE_TASK_BACKEND':
+        _backend = None
+
+
+def enqueue_image_processing(recipe_id: int) -> None:
+    """Поставить обработку изображения в очередь после фиксации транзакции"""
+    transaction.on_commit(lambda: get_backend().submit(recipe_id))
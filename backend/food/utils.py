@@ -0,0 +1,186 @@
+from typing import Iterable
+
+from django.db import connection, transaction
+from django.db.models import (Count, F, Model, OuterRef, QuerySet, Subquery,
+                              Sum)
+
+from .models import IngredientsRecipes, ShoppingCart, ShoppingListItem
+from foodgram.versions import bump_version
+
+CART_VERSION: str = 'cart:{user_id}'
+
+UPSERT_SHOPPING_LIST_SQL: str = (
+    'INSERT INTO {table} (user_id, ingredient_id, total_amount, recipe_count) '
+    '{select} '
+    'ON CONFLICT (user_id, ingredient_id) DO UPDATE SET '
+    'total_amount = {table}.total_amount + excluded.total_amount, '
+    'recipe_count = {table}.recipe_count + excluded.recipe_count'
+)
+
+
+def bump_cart_versions(user_ids: Iterable[int]) -> None:
+    """
+    После фиксации транзакции сменить версии корзин пользователей,
+    от которых зависят ETag и Last-Modified списка покупок
+    """
+    names = [CART_VERSION.format(user_id=user_id) for user_id in user_ids]
+    if names:
+        transaction.on_commit(lambda: bump_version(*names))
+
+
+def _upsert_shopping_list(select: str, params: tuple) -> None:
+    """Прибавить к спискам покупок строки, выбранные select"""
+    table = connection.ops.quote_name(ShoppingListItem._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPSERT_SHOPPING_LIST_SQL.format(table=table, select=select),
+            params,
+        )
+
+
+def _drop_empty_items(**filters) -> None:
+    """Удалить позиции, не входящие больше ни в один рецепт корзины"""
+    ShoppingListItem.objects.filter(recipe_count__lte=0, **filters).delete()
+
+
+def add_recipe_to_shopping_list(user: Model, recipe: Model) -> None:
+    """Добавить ингредиенты рецепта в список покупок пользователя"""
+    _upsert_shopping_list(
+        'SELECT %s, ingredient_id, amount, 1 FROM {} WHERE recipe_id = %s'
+        .format(connection.ops.quote_name(IngredientsRecipes._meta.db_table)),
+        (user.id, recipe.id),
+    )
+
+
+def add_recipes_to_shopping_list(
+    user: Model, recipe_ids: Iterable[int]
+) -> None:
+    """Добавить ингредиенты нескольких рецептов одним запросом"""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    _upsert_shopping_list(
+        'SELECT %s, ingredient_id, SUM(amount), COUNT(*) FROM {} '
+        'WHERE recipe_id IN ({}) GROUP BY ingredient_id'.format(
+            connection.ops.quote_name(IngredientsRecipes._meta.db_table),
+            ', '.join(['%s'] * len(recipe_ids)),
+        ),
+        (user.id, *recipe_ids),
+    )
+
+
+def remove_recipes_from_shopping_list(
+    user: Model, recipe_ids: Iterable[int]
+) -> None:
+    """Вычесть ингредиенты нескольких рецептов из списка пользователя"""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    removed = IngredientsRecipes.objects.filter(
+        recipe_id__in=recipe_ids, ingredient=OuterRef('ingredient')
+    ).order_by().values('ingredient')
+    ShoppingListItem.objects.filter(
+        user=user,
+        ingredient__in=IngredientsRecipes.objects.filter(
+            recipe_id__in=recipe_ids).values('ingredient'),
+    ).update(
+        total_amount=F('total_amount') - Subquery(
+            removed.annotate(total=Sum('amount')).values('total')),
+        recipe_count=F('recipe_count') - Subquery(
+            removed.annotate(count=Count('id')).values('count')),
+    )
+    _drop_empty_items(user=user)
+
+
+def remove_recipe_from_shopping_lists(
+    recipe: Model, users: Iterable[Model] = None
+) -> None:
+    """
+    Вычесть ингредиенты рецепта из списков покупок пользователей,
+    по умолчанию всех, у кого рецепт в корзине
+    """
+    items = ShoppingListItem.objects.filter(
+        ingredient__ingredient_in_recipe__recipe=recipe)
+    if users is None:
+        items = items.filter(user__shoping_card_recipe__recipe=recipe)
+    else:
+        items = items.filter(user__in=users)
+    items.update(
+        total_amount=F('total_amount') - Subquery(
+            IngredientsRecipes.objects.filter(
+                recipe=recipe, ingredient=OuterRef('ingredient')
+            ).values('amount')[:1]
+        ),
+        recipe_count=F('recipe_count') - 1,
+    )
+    _drop_empty_items(ingredient__ingredient_in_recipe__recipe=recipe)
+
+
+def change_recipe_in_shopping_lists(
+    recipe: Model, deltas: dict[int, tuple[int, int]]
+) -> None:
+    """
+    Применить изменения ингредиентов рецепта к спискам покупок
+    всех пользователей, у кого рецепт в корзине.
+    deltas: ingredient_id -> (изменение количества, изменение числа рецептов)
+    """
+    if not deltas:
+        return
+    bump_cart_versions(ShoppingCart.objects.filter(
+        recipe=recipe).values_list('user_id', flat=True))
+    cart_table = connection.ops.quote_name(ShoppingCart._meta.db_table)
+    for ingredient_id, (amount, count) in deltas.items():
+        if count > 0:
+            _upsert_shopping_list(
+                f'SELECT user_id, %s, %s, 1 FROM {cart_table} '
+                'WHERE recipe_id = %s',
+                (ingredient_id, amount, recipe.id),
+            )
+            continue
+        ShoppingListItem.objects.filter(
+            ingredient_id=ingredient_id,
+            user__shoping_card_recipe__recipe=recipe,
+        ).update(
+            total_amount=F('total_amount') + amount,
+            recipe_count=F('recipe_count') + count,
+        )
+    _drop_empty_items(ingredient_id__in=deltas)
+
+
+def live_shopping_lists(user_ids: Iterable[int] = None) -> QuerySet:
+    """Агрегировать списки покупок по корзинам напрямую"""
+    rows = IngredientsRecipes.objects.order_by().values(
+        'ingredient_id',
+        user_id=F('recipe__shoping_card_recipe__user'),
+    ).filter(
+        user_id__isnull=False
+    )
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    return rows.annotate(
+        total_amount=Sum('amount'),
+        recipe_count=Count('id'),
+    )
+
+
+def rebuild_shopping_lists(
+    user_ids: Iterable[int] = None, batch_size: int = 5000
+) -> int:
+    """Пересобрать списки покупок из корзин, вернуть число позиций"""
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    total, batch = 0, []
+    for row in live_shopping_lists(user_ids).iterator(chunk_size=batch_size):
+        batch.append(ShoppingListItem(
+            user_id=row['user_id'],
+            ingredient_id=row['ingredient_id'],
+            total_amount=row['total_amount'],
+            recipe_count=row['recipe_count'],
+        ))
+        if len(batch) >= batch_size:
+            total += len(ShoppingListItem.objects.bulk_create(batch))
+            batch = []
+    return total + len(ShoppingListItem.objects.bulk_create(batch))
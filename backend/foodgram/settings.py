@@ -104,6 +104,25 @@ DATABASES = {
     }
 }
 
+# Тесты гонок пишут в базу из нескольких потоков,
+# тестовая база SQLite в памяти этого не допускает
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+# По умолчанию кэш хранится в памяти процесса. Версии данных в кэше
+# сбрасывают кэши всех процессов gunicorn только при общем бэкенде,
+# поэтому при нескольких процессах нужен Redis или memcached:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://redis:6379/1
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -178,10 +197,39 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MAX_LENGHT_NAME_FOOD: int = 200
 MAX_LENGHT_COLOR_HEX: int = 7
+INGREDIENTS_SEARCH_LIMIT: int = int(os.getenv('INGREDIENTS_SEARCH_LIMIT', 20))
+INGREDIENTS_CATALOGUE_CACHE: bool = (
+    os.getenv('INGREDIENTS_CATALOGUE_CACHE', 'True') == 'True')
+INGREDIENTS_CATALOGUE_CHECK_INTERVAL: float = float(
+    os.getenv('INGREDIENTS_CATALOGUE_CHECK_INTERVAL', 5))
+COUNT_CACHE_TIMEOUT: int = int(os.getenv('COUNT_CACHE_TIMEOUT', 60))
+COUNT_ESTIMATE_THRESHOLD: int = int(
+    os.getenv('COUNT_ESTIMATE_THRESHOLD', 100000))
+RESPONSE_CACHE_TIMEOUT: int = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+RESPONSE_CACHE_STATS_INTERVAL: int = int(
+    os.getenv('RESPONSE_CACHE_STATS_INTERVAL', 60))
+IMAGE_MAX_UPLOAD_SIZE: int = int(
+    os.getenv('IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024))
+IMAGE_MAX_PIXELS: int = 40_000_000
+IMAGE_RENDITIONS: dict = {'thumb': 160, 'card': 640, 'full': 1600}
+IMAGE_RENDITION_QUALITY: int = 80
+IMAGE_TASK_BACKEND: str = os.getenv(
+    'IMAGE_TASK_BACKEND', 'food.tasks.ThreadPoolBackend')
+IMAGE_TASK_WORKERS: int = int(os.getenv('IMAGE_TASK_WORKERS', 2))
+BULK_RECIPES_LIMIT: int = int(os.getenv('BULK_RECIPES_LIMIT', 100))
+BULK_STATUS_ADDED: str = 'added'
+BULK_STATUS_EXISTS: str = 'exists'
+BULK_STATUS_REMOVED: str = 'removed'
+BULK_STATUS_MISSING: str = 'missing'
+BULK_STATUS_NOT_FOUND: str = 'not_found'
 EMPTY_VALUE_DISPLAY: str = '-пусто-'
 DEFOLT_MESSAGE_INCORECT_OBJ: tuple = ("не существуют", "не существует")
 FIRST_STRING_SHOPPING_LIST: str = 'Список покупок от {today}:\n'
 STRING_SHOPPING_LIST: str = '{number}. {name} - {amount} {measurement_unit}\n'
+SHOPPING_LIST_CHUNK_SIZE: int = 2000
+SHOPPING_LIST_PDF_FONT: str = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
 PATTERN_COLORS_TAG: str = r'#[A-F0-9]{6}$'
 MESSAGE_COLORS_TAG: str = 'Ведите цвет в HEX формате #FF1166'
 PATTERN_SLUG_TAG: str = r'^[-a-zA-Z0-9_]+$'
@@ -0,0 +1,36 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY: str = 'foodgram:version:{name}'
+
+
+def get_version(name: str) -> int:
+    """
+    Получить версию данных из кэша.
+    Версия согласована между процессами, если кэш общий
+    """
+    key = VERSION_KEY.format(name=name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*names: str) -> list[int]:
+    """Получить версии нескольких наборов данных одним обращением к кэшу"""
+    keys = [VERSION_KEY.format(name=name) for name in names]
+    versions = cache.get_many(keys)
+    return [
+        versions[key] if key in versions else get_version(name)
+        for name, key in zip(names, keys)
+    ]
+
+
+def bump_version(*names: str) -> None:
+    """Сменить версию данных, чтобы процессы сбросили свои копии"""
+    cache.set_many(
+        {VERSION_KEY.format(name=name): time.time_ns() for name in names},
+        timeout=None,
+    )
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from food.models import (Favorite, Ingredient, IngredientsRecipes, Recipe,
+                         ShoppingCart, ShoppingListItem)
+
+User = get_user_model()
+
+
+@override_settings(IMAGE_TASK_BACKEND='food.tasks.DisabledBackend')
+class BulkLinksQueriesTest(TestCase):
+    """
+    Пакетные запросы к избранному и корзине выполняются
+    постоянным числом запросов к базе и сбросов кэша
+    """
+    sizes = (1, 40)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, author = (
+            User.objects.create(
+                username=f'user_{num}', email=f'user_{num}@foodgram.ru',
+                first_name='Имя', last_name='Фамилия',
+            )
+            for num in range(2)
+        )
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {num}', measurement_unit='г')
+            for num in range(3)
+        ])
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=author, name=f'Рецепт {num}',
+                image='food_images/test.png', text='Описание',
+                cooking_time=10,
+            )
+            for num in range(max(cls.sizes))
+        ])
+        IngredientsRecipes.objects.bulk_create([
+            IngredientsRecipes(
+                recipe=recipe, ingredient=ingredient, amount=num + 1)
+            for num, recipe in enumerate(cls.recipes)
+            for ingredient in ingredients[:num % 3 + 1]
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe_ids(self, size: int) -> list[int]:
+        return [recipe.id for recipe in self.recipes[:size]]
+
+    def assert_request(
+        self, method: str, url: str, queries: int, data: dict = None
+    ) -> dict:
+        """
+        Выполнить запрос за queries запросов к базе и не более
+        чем с двумя сбросами кэша после фиксации: отметки
+        пользователя и версии корзины
+        """
+        with self.assertNumQueries(queries):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = getattr(self.client, method)(
+                    url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertLessEqual(len(callbacks), 2)
+        return response.data
+
+    def test_favorite_bulk(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                data = {'recipes': self.recipe_ids(size)}
+                self.assert_request('post', '/api/recipes/favorite/', 4, data)
+                self.assertEqual(
+                    Favorite.objects.filter(user=self.user).count(), size)
+                self.assert_request(
+                    'delete', '/api/recipes/favorite/', 4, data)
+                self.assertFalse(
+                    Favorite.objects.filter(user=self.user).exists())
+
+    def test_shopping_cart_bulk(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                data = {'recipes': self.recipe_ids(size)}
+                self.assert_request(
+                    'post', '/api/recipes/shopping_cart/', 5, data)
+                self.assertEqual(
+                    ShoppingCart.objects.filter(user=self.user).count(), size)
+                self.assert_request(
+                    'delete', '/api/recipes/shopping_cart/', 6, data)
+                self.assertFalse(
+                    ShoppingListItem.objects.filter(user=self.user).exists())
+
+    def test_shopping_cart_clear(self):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                self.client.post(
+                    '/api/recipes/shopping_cart/',
+                    {'recipes': self.recipe_ids(size)}, format='json')
+                result = self.assert_request(
+                    'delete', '/api/recipes/shopping_cart/clear/', 5)
+                self.assertEqual(
+                    [item['status'] for item in result['recipes']],
+                    [settings.BULK_STATUS_REMOVED] * size,
+                )
+                self.assertFalse(
+                    ShoppingCart.objects.filter(user=self.user).exists())
+                self.assertFalse(
+                    ShoppingListItem.objects.filter(user=self.user).exists())
@@ -0,0 +1,70 @@
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from api.utils import check_ingredients
+from food.models import Ingredient
+
+
+class CheckIngredientsTest(TestCase):
+    """Проверка ингредиентов рецепта одним запросом"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.salt, cls.sugar = Ingredient.objects.bulk_create([
+            Ingredient(name='Соль', measurement_unit='г'),
+            Ingredient(name='Сахар', measurement_unit='г'),
+        ])
+
+    def errors(self, ingredients) -> list[dict]:
+        """Ошибки по каждому ингредиенту в порядке запроса"""
+        with self.assertRaises(serializers.ValidationError) as context:
+            check_ingredients(ingredients, Ingredient)
+        return context.exception.detail['ingredients']
+
+    def test_valid(self):
+        with self.assertNumQueries(1):
+            result = check_ingredients([
+                {'id': self.salt.id, 'amount': 5},
+                {'id': str(self.sugar.id), 'amount': '10'},
+            ], Ingredient)
+        self.assertEqual(result, [(self.salt, 5), (self.sugar, 10)])
+
+    def test_missing_id(self):
+        errors = self.errors([{'amount': 5}])
+        self.assertEqual(
+            errors[0]['id'],
+            [serializers.Field.default_error_messages['required']],
+        )
+
+    def test_unknown_id(self):
+        errors = self.errors([
+            {'id': self.salt.id, 'amount': 5}, {'id': 10 ** 6, 'amount': 5}])
+        self.assertEqual(errors[0], {})
+        self.assertIn(str(10 ** 6), errors[1]['id'][0])
+
+    def test_duplicate(self):
+        errors = self.errors([
+            {'id': self.salt.id, 'amount': 5},
+            {'id': self.salt.id, 'amount': 7},
+        ])
+        self.assertEqual(errors[0], {})
+        self.assertIn(self.salt.name, errors[1]['id'][0])
+
+    def test_invalid_amount(self):
+        for amount in (0, -1, 'много', None):
+            with self.subTest(amount=amount):
+                errors = self.errors([{'id': self.salt.id, 'amount': amount}])
+                self.assertEqual(list(errors[0]), ['amount'])
+
+    def test_not_object(self):
+        for ingredients in ([5, 6], [None], [{'id': self.salt.id}, 'соль']):
+            with self.subTest(ingredients=ingredients):
+                errors = self.errors(ingredients)
+                self.assertEqual(len(errors), len(ingredients))
+                self.assertIn(
+                    api_settings.NON_FIELD_ERRORS_KEY, errors[-1])
+
+    def test_not_list(self):
+        with self.assertRaises(serializers.ValidationError):
+            check_ingredients({'id': self.salt.id, 'amount': 5}, Ingredient)
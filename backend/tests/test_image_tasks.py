@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from food.models import ImageTask, Recipe
+from food.tasks import run_database_tasks
+
+User = get_user_model()
+
+
+class DatabaseQueueTest(TestCase):
+    """Очередь задач обработки изображений в базе"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@foodgram.ru',
+            first_name='Имя', last_name='Фамилия',
+        )
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=author, name=f'Рецепт {num}',
+                image='food_images/test.png', text='Описание',
+                cooking_time=10,
+            )
+            for num in range(3)
+        ])
+
+    def test_failed_task_does_not_block_queue(self):
+        """Упавшая задача не откатывает и не задерживает остальные"""
+        ImageTask.objects.bulk_create(
+            [ImageTask(recipe=recipe) for recipe in self.recipes])
+        failing = self.recipes[0].id
+
+        def process(recipe_id: int) -> None:
+            if recipe_id == failing:
+                raise RuntimeError('Сбой обработки')
+            Recipe.objects.filter(pk=recipe_id).update(name='Готово')
+
+        with mock.patch('food.tasks.process_recipe_image', process):
+            self.assertEqual(run_database_tasks(), len(self.recipes))
+            self.assertEqual(run_database_tasks(), 0)
+        self.assertFalse(ImageTask.objects.exists())
+        self.assertEqual(
+            set(Recipe.objects.filter(
+                name='Готово').values_list('id', flat=True)),
+            {recipe.id for recipe in self.recipes[1:]},
+        )
+
+    def test_batch_size(self):
+        ImageTask.objects.bulk_create(
+            [ImageTask(recipe=recipe) for recipe in self.recipes])
+        with mock.patch('food.tasks.process_recipe_image'):
+            self.assertEqual(run_database_tasks(batch_size=2), 2)
+        self.assertEqual(ImageTask.objects.count(), 1)
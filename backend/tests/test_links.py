@@ -0,0 +1,110 @@
+import threading
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Model, QuerySet
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from food.models import Favorite, Recipe, ShoppingCart
+from user.models import Subscriptions
+
+User = get_user_model()
+
+
+@override_settings(IMAGE_TASK_BACKEND='food.tasks.DisabledBackend')
+class LinksRaceTest(TransactionTestCase):
+    """
+    Одновременное добавление и удаление одной связи:
+    проходит ровно один запрос, счётчик совпадает с таблицей
+    """
+    threads = 8
+
+    def setUp(self):
+        self.user, self.author = (
+            User.objects.create(
+                username=f'user_{num}', email=f'user_{num}@foodgram.ru',
+                first_name='Имя', last_name='Фамилия',
+            )
+            for num in range(2)
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', image='food_images/test.png',
+            text='Описание', cooking_time=10,
+        )
+
+    @staticmethod
+    def race(requests: list[tuple[Model, str, str]]) -> Counter:
+        """Отправить запросы (пользователь, метод, url) из потоков сразу"""
+        barrier = threading.Barrier(len(requests))
+        lock = threading.Lock()
+        codes = Counter()
+
+        def send(user: Model, method: str, url: str) -> None:
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                code = getattr(client, method)(url).status_code
+            except Exception as error:
+                code = type(error).__name__
+            finally:
+                connections.close_all()
+            with lock:
+                codes[code] += 1
+
+        threads = [
+            threading.Thread(target=send, args=request)
+            for request in requests
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return codes
+
+    def assert_race(
+        self, url: str, links: QuerySet, obj: Model, counter: str
+    ) -> None:
+        """Добавить и удалить связь из всех потоков"""
+        for method, success, count in (('post', 201, 1), ('delete', 204, 0)):
+            codes = self.race([(self.user, method, url)] * self.threads)
+            self.assertEqual(
+                codes, Counter({success: 1, 400: self.threads - 1}))
+            self.assertEqual(links.count(), count)
+            obj.refresh_from_db(fields=(counter,))
+            self.assertEqual(getattr(obj, counter), count)
+
+    def test_favorite(self):
+        self.assert_race(
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            Favorite.objects.filter(user=self.user, recipe=self.recipe),
+            self.recipe, 'favorites_count',
+        )
+
+    def test_shopping_cart(self):
+        self.assert_race(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            ShoppingCart.objects.filter(user=self.user, recipe=self.recipe),
+            self.recipe, 'in_carts_count',
+        )
+
+    def test_subscribe(self):
+        self.assert_race(
+            f'/api/users/{self.author.id}/subscribe/',
+            Subscriptions.objects.filter(
+                user=self.user, subscriber=self.author),
+            self.author, 'subscribers_count',
+        )
+
+    def test_mutual_subscribe(self):
+        """Встречные подписки не блокируют друг друга"""
+        codes = self.race([
+            (self.user, 'post', f'/api/users/{self.author.id}/subscribe/'),
+            (self.author, 'post', f'/api/users/{self.user.id}/subscribe/'),
+        ])
+        self.assertEqual(codes, Counter({201: 2}))
+        for user in (self.user, self.author):
+            user.refresh_from_db(fields=('subscribers_count',))
+            self.assertEqual(user.subscribers_count, 1)
@@ -2,7 +2,34 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class CookUser(AbstractUser):
+class CountersMixin(models.Model):
+    """
+    Модель со счётчиками, которые меняются только через F(),
+    и полями, которые пишутся фоновыми UPDATE (background_fields).
+    Сохранение загруженного экземпляра не перезаписывает их
+    устаревшими значениями
+    """
+    counter_fields: tuple[str, ...] = ()
+    background_fields: tuple[str, ...] = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs) -> None:
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+                and field.name not in self.background_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class CookUser(CountersMixin, AbstractUser):
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name', )
@@ -21,6 +48,18 @@ class CookUser(AbstractUser):
         blank=True,
         verbose_name='Подписки',
     )
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('recipes_count', 'subscribers_count')
 
     class Meta:
         ordering = ('username', )
@@ -36,12 +75,16 @@ class Subscriptions(models.Model):
         CookUser,
         on_delete=models.CASCADE,
         related_name='subscription',
+        # Покрыт уникальным ограничением (user, subscriber)
+        db_index=False,
         verbose_name='Автор',
     )
     subscriber = models.ForeignKey(
         CookUser,
         on_delete=models.CASCADE,
         related_name='subscriber',
+        # Покрыт индексом (subscriber, user)
+        db_index=False,
         verbose_name='Подписчики',
     )
 
@@ -57,3 +100,8 @@ class Subscriptions(models.Model):
                 check=~models.Q(user=models.F('subscriber')),
                 name='not_self',)
         )
+        indexes = (
+            models.Index(
+                fields=('subscriber', 'user'),
+                name='subscription_subscriber_idx'),
+        )